@@ -0,0 +1,97 @@
+# address_index.py
+"""
+Índice de prefijos en memoria para sugerir direcciones mientras se escribe.
+
+Lista ordenada de claves normalizadas + bisect: cada dirección se indexa por su
+texto completo y por cada palabra desde la que empieza ("major 1 girona" también
+encuentra "Carrer Major 1, Girona"). Una búsqueda es un bisect y un recorrido
+acotado, del orden de decenas de microsegundos con cientos de miles de entradas.
+"""
+import threading
+from bisect import bisect_left, insort
+
+from address_normalize import canonical_key
+
+# Prioridad por origen: primero lo que ya usó el usuario, luego lo ya geocodificado
+SOURCE_WEIGHT = {"user": 3.0, "cache": 2.0, "gazetteer": 1.0}
+_MAX_SCAN = 256   # coincidencias que se puntúan como máximo por búsqueda
+
+
+def _clean(text):
+    return canonical_key(text)
+
+
+class PrefixIndex:
+    """Direcciones únicas (por clave normalizada) con su origen y peso."""
+
+    def __init__(self, entries=()):
+        self._keys = []       # lista ordenada de (sufijo de palabra, id)
+        self._entries = []    # id -> [texto, clave, peso, origen]
+        self._by_key = {}     # clave -> id
+        self._lock = threading.Lock()
+        self.add_many(entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _add(self, label, source, weight):
+        """Registra la entrada; devuelve sus claves nuevas (vacío si ya existía)."""
+        key = _clean(label)
+        if not key:
+            return []
+        weight = SOURCE_WEIGHT.get(source, 1.0) if weight is None else weight
+        idx = self._by_key.get(key)
+        if idx is not None:
+            entry = self._entries[idx]
+            if weight > entry[2]:
+                entry[2], entry[3] = weight, source
+            return []
+        idx = len(self._entries)
+        self._entries.append([str(label).strip(), key, weight, source])
+        self._by_key[key] = idx
+        keys = []
+        pos = 0
+        for word in key.split(" "):
+            keys.append((key[pos:], idx))
+            pos += len(word) + 1
+        return keys
+
+    def add(self, label, source="cache", weight=None):
+        """Añade la dirección (o sube su peso si ya existe con un origen de menos prioridad)."""
+        with self._lock:
+            for item in self._add(label, source, weight):
+                insort(self._keys, item)
+
+    def add_many(self, entries):
+        """Carga masiva de (texto, origen): una sola ordenación en vez de un insort por clave."""
+        with self._lock:
+            new_keys = []
+            for label, source in entries:
+                new_keys.extend(self._add(label, source, None))
+            if new_keys:
+                self._keys.extend(new_keys)
+                self._keys.sort()
+
+    def search(self, query, limit=5):
+        """Hasta `limit` sugerencias [{label, source, score}] cuyo texto (o alguna palabra) empieza por `query`."""
+        prefix = _clean(query)
+        if not prefix:
+            return []
+        keys = self._keys
+        found = {}
+        i = bisect_left(keys, (prefix,))
+        end = min(len(keys), i + _MAX_SCAN)
+        while i < end:
+            suffix, idx = keys[i]
+            if not suffix.startswith(prefix):
+                break
+            if idx not in found:
+                _, key, weight, _ = self._entries[idx]
+                # Mejor si coincide desde el principio y si es corta (más parecida a lo tecleado)
+                found[idx] = weight + (1.0 if key.startswith(prefix) else 0.0) - len(key) / 1000.0
+            i += 1
+        best = sorted(found.items(), key=lambda kv: -kv[1])[:limit]
+        return [
+            {"label": self._entries[idx][0], "source": self._entries[idx][3], "score": round(score, 3)}
+            for idx, score in best
+        ]
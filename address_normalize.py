@@ -0,0 +1,105 @@
+# address_normalize.py
+"""
+Normalización de direcciones compartida por toda la aplicación.
+
+canonical_key() produce la clave con la que se deduplican las paradas y se indexan
+la caché de geocodificación, el nomenclátor y las sugerencias:
+  - plegado Unicode (sin acentos ni mayúsculas: "Plaça" → "placa")
+  - puntuación a espacios y espacios colapsados
+  - abreviaturas de vía expandidas ("c/" → "carrer", "avda." → "avinguda")
+  - sin conectores ("de", "del", "d'", "l'") ni país/región al final
+
+parse_waypoints() aplica todo en una sola pasada sobre texto o líneas (p. ej. un
+fichero abierto), sin construir listas intermedias.
+"""
+import os
+import re
+import unicodedata
+from functools import lru_cache
+
+# Todas las formas de cada tipo de vía se reducen a una (la catalana, por ser la de la zona)
+STREET_TYPES = {
+    "c": "carrer", "c/": "carrer", "cl": "carrer", "cl/": "carrer", "calle": "carrer", "carrer": "carrer",
+    "av": "avinguda", "av/": "avinguda", "avd": "avinguda", "avda": "avinguda", "avenida": "avinguda",
+    "avinguda": "avinguda",
+    "pl": "placa", "pl/": "placa", "pza": "placa", "plz": "placa", "plza": "placa", "plaza": "placa",
+    "placa": "placa",
+    "pg": "passeig", "pg/": "passeig", "po": "passeig", "pso": "passeig", "paseo": "passeig",
+    "passeig": "passeig",
+    "ctra": "carretera", "ctra/": "carretera", "crta": "carretera", "carretera": "carretera",
+    "rda": "ronda", "ronda": "ronda",
+    "tr": "travessera", "trav": "travessera", "travesia": "travessera", "travessera": "travessera",
+}
+CONNECTORS = {"de", "del", "dels", "d", "l"}
+TRAILING_REGIONS = {"espana", "spain", "catalunya", "cataluna", "catalonia"}
+# Localidad por defecto (p. ej. "barcelona"): si va al final se ignora en la clave
+DEFAULT_LOCALITY = os.getenv("ADDRESS_DEFAULT_LOCALITY", "").strip().lower()
+
+OPTIMIZE_TOKENS = ("optimize", "optimize:true")
+
+# Puntuación que separa palabras; "/" se conserva para reconocer "c/" y similares
+_PUNCT = str.maketrans({ch: " " for ch in ",.;:()[]{}\"'`´’‘“”«»-_#ºª"})
+_SLASH_RE = re.compile(r"(?<=\w/)(?=\w)")   # "c/mallorca" → "c/ mallorca"
+
+
+def fold(text) -> str:
+    """Minúsculas y sin diacríticos ("Àngel" → "angel"); el resto de caracteres se conserva."""
+    text = str(text or "").casefold()
+    if text.isascii():
+        return text
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def clean_label(text) -> str:
+    """Texto para mostrar: solo sin espacios sobrantes (conserva mayúsculas y acentos)."""
+    return " ".join(str(text or "").split())
+
+
+@lru_cache(maxsize=65536)
+def _canonical(text) -> str:
+    words = _SLASH_RE.sub(" ", fold(text).translate(_PUNCT)).split()
+    out = []
+    for i, word in enumerate(words):
+        # Las abreviaturas sueltas ("c", "pl") solo al principio o con barra: "Bloque C" no es un carrer
+        if (i == 0 and len(words) > 1) or word.endswith("/") or len(word) > 4:
+            word = STREET_TYPES.get(word, word)
+        word = word.strip("/")
+        if word and word not in CONNECTORS:
+            out.append(word)
+    while len(out) > 1 and (out[-1] in TRAILING_REGIONS or (DEFAULT_LOCALITY and out[-1] == DEFAULT_LOCALITY)):
+        out.pop()
+    return " ".join(out)
+
+
+def canonical_key(text) -> str:
+    """Clave canónica de una dirección (ver docstring del módulo)."""
+    return _canonical(str(text or ""))
+
+
+@lru_cache(maxsize=65536)
+def _parse_item(item):
+    """(texto limpio, clave) de una parada, o (None, None) si se descarta. Cacheado: los reruns repiten el texto."""
+    address = " ".join(item.split())
+    if not address or address.lower() in OPTIMIZE_TOKENS:
+        return None, None
+    return address, _canonical(address) or None
+
+
+def parse_waypoints(raw):
+    """
+    Genera {"address", "key"} por parada, en una sola pasada sobre texto (líneas y/o '|')
+    o un iterable de líneas: sin vacíos, sin el token 'optimize'/'optimize:true' y sin
+    duplicados según canonical_key (se queda la primera aparición).
+    """
+    seen = set()
+    lines = raw.splitlines() if isinstance(raw, str) else (raw or ())
+    for line in lines:
+        if not isinstance(line, str):
+            line = str(line or "")
+        for item in (line.split("|") if "|" in line else (line,)):
+            address, key = _parse_item(item)
+            if key is None or key in seen:
+                continue
+            seen.add(key)
+            yield {"address": address, "key": key}
@@ -1,4 +1,5 @@
 import streamlit as st
+import import_profile
 from photo_agent_app import main, init_ui_state
 
 # 💥 CORRECCIÓN FINAL: Solo llamamos a la función de inicialización única.
@@ -8,6 +9,7 @@ st.set_page_config(page_title="AppRutas", layout="wide")
 
 try:
     main()
+    import_profile.dump()
 except Exception as e:
     st.error(f"Ocurrió un error al iniciar la aplicación: {e}")
     import traceback
@@ -1,58 +1,189 @@
 import urllib.parse
+import contextvars
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import streamlit as st
 from dotenv import load_dotenv
-import googlemaps
+
+from address_normalize import canonical_key, clean_label, parse_waypoints
+from geocode_cache import GeocodeCache
+from gazetteer import load_gazetteer
+from address_index import PrefixIndex
+from geocode_metrics import GeocodeMetrics, track_usage
+from geocoders import (
+    CacheProvider, GazetteerProvider, GoogleProvider, NominatimProvider, ProviderChain, RateLimiter,
+)
 
 # ----------------- LECTURA DE CLAVES DE API -----------------
 load_dotenv()
 GMAPS_API_KEY = os.getenv("GOOGLE_API_KEY") 
 
+# Concurrencia y ritmo máximo de llamadas a la API de geocodificación
+GEOCODE_MAX_WORKERS = int(os.getenv("GEOCODE_MAX_WORKERS", "8"))
+GEOCODE_MAX_QPS = float(os.getenv("GEOCODE_MAX_QPS", "20"))
+
+# Proveedores de geocodificación, en orden: cache, local (nomenclátor), google, nominatim
+GEOCODER_CHAIN = os.getenv("GEOCODER_CHAIN", "cache,local,google")
+GEOCODE_TIMEOUT = float(os.getenv("GEOCODE_TIMEOUT", "5"))
+GEOCODE_HEDGE = os.getenv("GEOCODE_HEDGE", "1") != "0"
+NOMINATIM_URL = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org")
+NOMINATIM_USER_AGENT = os.getenv("NOMINATIM_USER_AGENT", "genera-tu-ruta/1.0")
+
+# Sugerencias: mínimo de caracteres, espera tras la última pulsación antes de ir a la red
+SUGGEST_MIN_CHARS = 3
+SUGGEST_DEBOUNCE = float(os.getenv("SUGGEST_DEBOUNCE", "0.4"))
+SUGGEST_CACHE_ITEMS = 20_000
+
+# Métricas de llamadas: volcado periódico opcional a JSON (ruta y segundos entre volcados)
+GEOCODE_METRICS_DUMP = os.getenv("GEOCODE_METRICS_DUMP")
+GEOCODE_METRICS_INTERVAL = float(os.getenv("GEOCODE_METRICS_INTERVAL", "60"))
+
 # Inicialización del cliente de Google Maps
-@st.cache_resource
-def get_gmaps_client():
-    key_to_use = GMAPS_API_KEY
-    if not key_to_use:
-        # Usamos st.error en lugar de st.warning si la clave es crítica para el funcionamiento
-        st.warning("⚠️ Clave API no configurada. La Geocodificación será SIMULADA.")
-        return None
+# El cliente se crea en el primer uso (sin red) y la clave se valida en segundo plano,
+# de modo que importar este módulo nunca bloquea el arranque ni consume cuota.
+_client_lock = threading.Lock()
+_client_ready = False
+_gmaps_client = None
+_client_health = {"status": "unknown", "checked_at": None, "error": None}
+
+def _safe_error(e) -> str:
+    """Texto del error sin la clave API (las excepciones de requests incluyen la URL completa)."""
+    text = str(e)
+    return text.replace(GMAPS_API_KEY, "***") if GMAPS_API_KEY else text
+
+def _validate_client(client):
+    """Prueba ligera de la clave; el resultado queda en client_health()."""
+    metrics = get_geocode_metrics()
+    t0 = time.perf_counter()
     try:
-        # Se verifica la clave antes de devolver el cliente
-        client = googlemaps.Client(key=key_to_use)
-        # Opcional: una prueba ligera para confirmar que la clave es válida
+        _GEOCODE_LIMITER.wait()
+        metrics.record_call("google")
         client.geocode("Barcelona")
-        return client
-    except Exception:
-        # Si falla por cualquier motivo (conexión, clave inválida), devolvemos None
-        st.error("❌ Fallo al inicializar Google Maps API Client. Revisa la clave o la conexión.")
-        return None
+        metrics.observe("google", time.perf_counter() - t0)
+        _client_health.update(status="ok", error=None)
+    except Exception as e:
+        metrics.observe("google", time.perf_counter() - t0, "error", e)
+        print(f"Fallo al validar Google Maps API Client: {_safe_error(e)}")
+        _client_health.update(status="error", error=_safe_error(e))
+    _client_health["checked_at"] = time.time()
 
-GMAPS_CLIENT = get_gmaps_client()
+def get_gmaps_client():
+    """Devuelve el cliente de Google Maps (o None si no hay clave o no se pudo crear)."""
+    global _client_ready, _gmaps_client
+    if _client_ready:
+        return _gmaps_client
+    with _client_lock:
+        if _client_ready:
+            return _gmaps_client
+        if not GMAPS_API_KEY:
+            _client_health.update(status="disabled", error="GOOGLE_API_KEY no configurada")
+        else:
+            try:
+                import googlemaps  # ~60 ms: solo cuando hay clave y se usa por primera vez
+                # Sin timeout, una llamada colgada retiene su hilo del pool aunque la cadena la abandone
+                _gmaps_client = googlemaps.Client(
+                    key=GMAPS_API_KEY, timeout=GEOCODE_TIMEOUT, retry_timeout=GEOCODE_TIMEOUT
+                )
+                _client_health["status"] = "checking"
+                threading.Thread(
+                    target=_validate_client, args=(_gmaps_client,), name="gmaps-validate", daemon=True
+                ).start()
+            except Exception as e:
+                # Clave con formato inválido, etc.
+                print(f"Fallo al inicializar Google Maps API Client: {_safe_error(e)}")
+                _client_health.update(status="error", error=_safe_error(e), checked_at=time.time())
+                _gmaps_client = None
+        _client_ready = True
+    return _gmaps_client
 
-# ----------------- Funciones de Geocodificación y URL -----------------
+def set_gmaps_client(client):
+    """Sustituye el cliente (p. ej. por uno simulado en pruebas o benchmarks)."""
+    global _client_ready, _gmaps_client
+    with _client_lock:
+        _gmaps_client = client
+        _client_ready = True
+        _client_health.update(status="ok" if client else "disabled", error=None, checked_at=time.time())
 
-def geocode_address(query):
-    if not GMAPS_CLIENT:
-        return None
-    
+def client_health() -> dict:
+    """Estado de la validación de la clave: unknown, checking, ok, error o disabled."""
+    return dict(_client_health)
+
+def __getattr__(name):
+    # Compatibilidad: GMAPS_CLIENT y la bandera de “API disponible” `gmaps`
+    # se resuelven perezosamente al acceder a ellos
+    if name == "GMAPS_CLIENT":
+        return get_gmaps_client()
+    if name == "gmaps":
+        return bool(get_gmaps_client())
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Métricas de todas las llamadas de geocodificación del proceso.
+# Sin spinner: estos recursos pueden crearse por primera vez desde un hilo de resolve_many,
+# que no tiene contexto de sesión donde pintarlo (NoSessionContext).
+@st.cache_resource(show_spinner=False)
+def get_geocode_metrics():
+    metrics = GeocodeMetrics()
+    if GEOCODE_METRICS_DUMP:
+        metrics.start_json_dump(GEOCODE_METRICS_DUMP, GEOCODE_METRICS_INTERVAL)
+    return metrics
+
+def geocode_metrics_text() -> str:
+    """Métricas en formato de texto de Prometheus."""
+    return get_geocode_metrics().prometheus_text()
+
+# Caché de geocodificación compartida por todas las sesiones del proceso
+@st.cache_resource(show_spinner=False)
+def get_geocode_cache():
+    return GeocodeCache()
+
+# Nomenclátor local (GAZETTEER_PATH): primer nivel, sin red ni clave API
+@st.cache_resource(show_spinner=False)
+def get_gazetteer():
     try:
-        results = GMAPS_CLIENT.geocode(query)
-        if results:
-            location = results[0]['geometry']['location']
-            formatted_address = results[0]['formatted_address']
-            return {
-                "address": formatted_address,
-                "lat": location['lat'],
-                "lon": location['lng']
-            }
+        return load_gazetteer()
     except Exception as e:
-        # Manejo de error de geocodificación (ej. límite excedido)
-        print(f"Error geocodificando {query}: {e}")
+        print(f"No se pudo cargar el nomenclátor local: {e}")
         return None
-    return None
+
+# ----------------- Funciones de Geocodificación y URL -----------------
+
+_GEOCODE_LIMITER = RateLimiter(GEOCODE_MAX_QPS)
+
+def set_geocode_qps(qps):
+    """Cambia el ritmo máximo de llamadas a la API (p. ej. desde la línea de comandos)."""
+    _GEOCODE_LIMITER.set_qps(qps)
+
+def _build_provider(name):
+    if name == "cache":
+        return CacheProvider(get_geocode_cache())
+    if name == "local":
+        return GazetteerProvider(get_gazetteer)
+    if name == "google":
+        return GoogleProvider(get_gmaps_client, _GEOCODE_LIMITER, secret=GMAPS_API_KEY, timeout=GEOCODE_TIMEOUT)
+    if name == "nominatim":
+        return NominatimProvider(NOMINATIM_URL, NOMINATIM_USER_AGENT, timeout=GEOCODE_TIMEOUT)
+    raise ValueError(f"Proveedor de geocodificación desconocido: {name}")
+
+# Cadena de proveedores (GEOCODER_CHAIN), compartida por todas las sesiones del proceso
+@st.cache_resource(show_spinner=False)
+def get_geocoder_chain():
+    names = [n.strip().lower() for n in GEOCODER_CHAIN.split(",") if n.strip()]
+    return ProviderChain([_build_provider(n) for n in names], cache=get_geocode_cache(), hedge=GEOCODE_HEDGE,
+                         metrics=get_geocode_metrics())
+
+def geocode_address(query):
+    result = get_geocoder_chain().geocode(query)
+    if result is not None and _suggest_index is not None:
+        _suggest_index.add(result["address"], source=result.get("source", "cache"))
+    return result
 
 def resolve_selection(label, meta=None):
-    """Convierte la dirección a metadatos (coordenadas o texto)."""
+    """
+    Convierte la dirección a metadatos (coordenadas o texto). GeocodeError si ningún
+    proveedor pudo responder (cuota, clave, red); resolve_many lo deja en "error".
+    """
     geo_data = geocode_address(label)
     
     if geo_data:
@@ -62,19 +193,144 @@ def resolve_selection(label, meta=None):
             "address": geo_data['address'], 
             "coords": coords,
             "lat": geo_data['lat'],
-            "lon": geo_data['lon']
+            "lon": geo_data['lon'],
+            "place_id": geo_data.get('place_id'),
+            "resolved_at": geo_data.get('resolved_at'),
         }
         
-    # Si la geocodificación falla, asumimos que es una dirección de texto o una coordenada mal escrita
+    # Si no se encuentra, asumimos que es una dirección de texto o una coordenada mal escrita
     # y la guardamos en ambos campos para que build_gmaps_url decida.
     label_stripped = (label or "").strip()
     return {"address": label_stripped, "coords": label_stripped}
 
+def resolve_many(labels, max_workers=GEOCODE_MAX_WORKERS, progress=None):
+    """
+    Resuelve varias direcciones en paralelo y devuelve los metadatos en el mismo orden.
+    Las entradas repetidas (misma clave normalizada) se resuelven una sola vez.
+    Un fallo en una dirección no afecta al resto: ese elemento lleva la clave "error".
+    `progress(hechas, total)` se llama desde el hilo que invoca según terminan (direcciones únicas).
+    """
+    labels = list(labels or [])
+    unique = {}
+    for label in labels:
+        unique.setdefault(canonical_key(label), label)
+
+    def _resolve(label):
+        try:
+            return resolve_selection(label, None)
+        except Exception as e:
+            label_stripped = (label or "").strip()
+            return {"address": label_stripped, "coords": label_stripped, "error": str(e)}
+
+    keys = list(unique)
+    get_geocoder_chain()  # se crea (si hace falta) en este hilo, no en los del pool
+    # Si todo está ya en caché no merece la pena arrancar hilos. contains() no toca los
+    # contadores de aciertos: la consulta de verdad la hace después la cadena
+    cache = get_geocode_cache()
+    pending = sum(1 for k in keys if not cache.contains(unique[k]))
+    workers = max(1, min(max_workers, pending))
+    if workers == 1:
+        results = []
+        for k in keys:
+            results.append(_resolve(unique[k]))
+            if progress:
+                progress(len(results), len(keys))
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="geocode") as pool:
+            # Cada tarea con una copia del contexto, para que track_usage() cuente sus llamadas
+            futures = [pool.submit(contextvars.copy_context().run, _resolve, unique[k]) for k in keys]
+            if progress:
+                for done, _ in enumerate(as_completed(futures), 1):
+                    progress(done, len(keys))
+            results = [f.result() for f in futures]
+
+    by_key = dict(zip(keys, results))
+    return [dict(by_key[canonical_key(label)]) for label in labels]
+
+# ----------------- Sugerencias de direcciones -----------------
+# Índice de prefijos en memoria (caché de geocodificación + nomenclátor) compartido por el proceso,
+# más uno pequeño por usuario con las direcciones de sus rutas guardadas.
+_suggest_lock = threading.Lock()
+_suggest_index = None
+_user_indexes = {}
+_suggest_timers = {}
+
+def get_address_index():
+    """Índice global de sugerencias; se construye en el primer uso."""
+    global _suggest_index
+    if _suggest_index is not None:
+        return _suggest_index
+    with _suggest_lock:
+        if _suggest_index is None:
+            index = PrefixIndex((value.get("address"), "cache")
+                                for value in get_geocode_cache().recent(SUGGEST_CACHE_ITEMS))
+            gazetteer = get_gazetteer()
+            if gazetteer is not None:
+                index.add_many((address, "gazetteer") for address in gazetteer.addresses())
+            _suggest_index = index
+    return _suggest_index
+
+def set_user_addresses(user, labels):
+    """(Re)construye el índice de sugerencias del usuario con las direcciones de sus rutas."""
+    _user_indexes[user] = PrefixIndex((label, "user") for label in labels)
+
+def _debounced_lookup(key, query):
+    """Geocodifica `query` si nadie ha tecleado nada nuevo con la misma clave en SUGGEST_DEBOUNCE s."""
+    def run():
+        with _suggest_lock:
+            if _suggest_timers.get(key) is not timer:
+                return
+            del _suggest_timers[key]
+        try:
+            geocode_address(query)  # la cadena ya sirve de la caché lo que no sea nuevo
+        except Exception as e:
+            print(f"Error sugiriendo {query}: {_safe_error(e)}")
+
+    timer = threading.Timer(SUGGEST_DEBOUNCE, run)
+    timer.daemon = True
+    with _suggest_lock:
+        previous = _suggest_timers.get(key)
+        if previous is not None:
+            previous.cancel()
+        _suggest_timers[key] = timer
+    timer.start()
+
+def suggest_addresses(query, limit=5, user=None, remote=True, client=None):
+    """
+    Sugerencias [{label, source, score}] para el texto tecleado, sin red (índice en memoria).
+    Si hay menos de `limit` y `remote`, se programa una geocodificación con debounce
+    (por cliente y usuario) cuyo resultado aparecerá en las siguientes pulsaciones.
+    """
+    if len(canonical_key(query)) < SUGGEST_MIN_CHARS:
+        return []
+    results = []
+    seen = set()
+    indexes = [_user_indexes.get(user), get_address_index()]
+    for index in indexes:
+        if index is None:
+            continue
+        for item in index.search(query, limit):
+            key = canonical_key(item["label"])
+            if key not in seen:
+                seen.add(key)
+                results.append(item)
+    results = results[:limit]
+    if remote and len(results) < limit:
+        _debounced_lookup((client, user), query)
+    return results
+
 # --- Añadir estas utilidades para deep links / intents ---
 def _encode_for_uri(s: str) -> str:
     """Codifica la cadena para URL/URI."""
     return urllib.parse.quote(str(s or ""), safe="")
 
+def sanitize_waypoints(raw):
+    """
+    Paradas escritas por el usuario (por líneas y/o separadas por '|', o ya en lista) a
+    [{"address", "key"}]: sin vacíos, sin el token 'optimize' y sin duplicados por clave canónica.
+    """
+    return list(parse_waypoints(raw))
+
 def build_gmaps_web_url(origin_meta, destination_meta, waypoints_meta=None, mode="driving", avoid=None, optimize=False):
     """
     URL web (api=1) — preview en navegador / posibilidad de abrir app.
@@ -111,42 +367,9 @@ def build_gmaps_web_url(origin_meta, destination_meta, waypoints_meta=None, mode
     # Usamos /dir/ para forzar la navegación
     return "https://www.google.com/maps/dir/?" + "&".join(parts)
 
-def build_waze_url(origin_meta, destination_meta):
-    # CORRECCIÓN: Obtener la dirección del destino de los metadatos correctos
-    origin = origin_meta.get("coords") or origin_meta.get("address")
-    
-    # Priorizamos coordenadas para waze, si están disponibles
-    dest_lat = destination_meta.get("lat")
-    dest_lon = destination_meta.get("lon")
-    destination_address = destination_meta.get("address")
-    
-    if dest_lat and dest_lon:
-        ll = f"{dest_lat},{dest_lon}"
-        return (
-            "https://waze.com/ul"
-            f"?ll={_encode(ll)}"
-            f"&navigate=yes&from_name={_encode(origin)}"
-        )
-    
-    # Si no hay coordenadas (geo_data falló), usamos la dirección de texto
-    return (
-        "https://waze.com/ul"
-        f"?q={_encode(destination_address)}"
-        f"&navigate=yes&from_name={_encode(origin)}"
-    )
+# Alias histórico: las pestañas Viajero/Turístico importan build_gmaps_url
+build_gmaps_url = build_gmaps_web_url
 
-def build_apple_maps_url(origin_meta, destination_meta, waypoints=None):
-    # CORRECCIÓN: Obtener la dirección del destino de los metadatos correctos
-    origin = origin_meta.get("address")
-    destination = destination_meta.get("address")
-    
-    # Apple Maps es muy sensible. Usaremos saddr y daddr.
-    return (
-        "https://maps.apple.com/"
-        f"?saddr={_encode(origin)}"
-        f"&daddr={_encode(destination)}"
-        "&dirflg=d" # Indica conducción
-    )
 # ==============================================================================
 # NUEVAS FUNCIONES DE DEEP LINK 
 # ==============================================================================
@@ -215,15 +438,61 @@ def build_waze_url(origin_meta, destination_meta):
         f"&navigate=yes&from_name={_encode_for_uri(origin)}"
     )
 
-def build_apple_maps_url(origin_meta, destination_meta, waypoints=None):
+# Modo de Google Maps -> dirflg de Apple Maps (no tiene modo bicicleta)
+_APPLE_DIRFLG = {"driving": "d", "walking": "w", "transit": "r"}
+
+def _apple_dirflg(mode):
+    flag = _APPLE_DIRFLG.get(mode)
+    return f"&dirflg={flag}" if flag else ""
+
+def build_apple_maps_url(origin_meta, destination_meta, waypoints=None, mode="driving"):
+    """Sin dirflg para los modos que Apple Maps no admite (bicicleta): usa el modo por defecto."""
     origin = origin_meta.get("address")
     destination = destination_meta.get("address")
     return (
         "https://maps.apple.com/"
         f"?saddr={_encode_for_uri(origin)}"
         f"&daddr={_encode_for_uri(destination)}"
-        "&dirflg=d"
+        f"{_apple_dirflg(mode)}"
     )
 
-# Bandera de “API disponible”
-gmaps = bool(GMAPS_CLIENT)
+# ==============================================================================
+# RUTAS LARGAS: DIVISIÓN EN TRAMOS
+# ==============================================================================
+
+# Google Maps web admite origen + 9 paradas + destino; a partir de ahí descarta paradas
+GMAPS_MAX_WAYPOINTS = 9
+LEG_MAX_POINTS = GMAPS_MAX_WAYPOINTS + 2
+
+def split_route_legs(metas, max_points=LEG_MAX_POINTS):
+    """
+    Divide una ruta ordenada en tramos consecutivos de como mucho `max_points` puntos.
+    Los tramos se solapan en un punto: el destino de uno es el origen del siguiente.
+    """
+    metas = list(metas or [])
+    if len(metas) <= max_points:
+        return [metas]
+    step = max_points - 1
+    return [metas[i:i + max_points] for i in range(0, len(metas) - 1, step)]
+
+def build_route_legs(metas, mode="driving", optimize=False, max_points=LEG_MAX_POINTS):
+    """
+    Genera en un solo paso los enlaces de cada tramo (Google Maps, Waze y Apple Maps).
+    Devuelve una lista de dicts: index, start, end, points, gmaps, waze, apple.
+    """
+    legs = []
+    for i, leg in enumerate(split_route_legs(metas, max_points)):
+        if len(leg) < 2:
+            continue
+        o_meta, d_meta, waypoints_meta = leg[0], leg[-1], leg[1:-1]
+        legs.append({
+            "index": i,
+            "start": o_meta.get("address"),
+            "end": d_meta.get("address"),
+            "points": len(leg),
+            "gmaps": build_gmaps_web_url(o_meta, d_meta, waypoints_meta or None, mode=mode, optimize=optimize),
+            "waze": build_waze_url(o_meta, d_meta),
+            "apple": build_apple_maps_url(o_meta, d_meta, mode=mode),
+        })
+    return legs
+
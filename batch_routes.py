@@ -0,0 +1,180 @@
+# batch_routes.py
+"""
+Generación de rutas por lotes, sin Streamlit.
+
+Lee un CSV o JSONL con muchas rutas, geocodifica una sola vez todas las direcciones
+distintas (caché compartida + hilos concurrentes), opcionalmente optimiza el orden
+y escribe, ruta a ruta, un JSONL con los enlaces de cada tramo y los QR en PNG.
+
+Formatos de entrada:
+  JSONL: {"route_id": "R1", "stops": ["origen", "parada", ..., "destino"]}
+  CSV:   columnas route_id,stops   (paradas separadas por "|"), o
+         columnas route_id,stop    (una fila por parada, en orden)
+
+Uso:
+    python batch_routes.py lunes.csv -o lunes_links.jsonl --qr-dir qr/ --optimize
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import app_utils_core
+from app_utils_core import build_route_legs, resolve_many
+from qr_service import qr_batch
+from route_optimizer import optimize_coords
+
+
+# ---------------------------
+# Lectura
+# ---------------------------
+def _split_stops(raw):
+    return [s.strip() for s in str(raw or "").split("|") if s.strip()]
+
+
+def read_routes(path):
+    """Devuelve [(route_id, [paradas...]), ...] en el orden del fichero."""
+    path = Path(path)
+    if path.suffix.lower() in (".jsonl", ".ndjson"):
+        routes = []
+        with path.open(encoding="utf-8") as fh:
+            for n, line in enumerate(fh, 1):
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                stops = row.get("stops") or []
+                if isinstance(stops, str):
+                    stops = _split_stops(stops)
+                routes.append((str(row.get("route_id") or n), [str(s).strip() for s in stops if str(s).strip()]))
+        return routes
+
+    grouped = OrderedDict()
+    with path.open(encoding="utf-8-sig", newline="") as fh:
+        reader = csv.DictReader(fh)
+        fields = set(reader.fieldnames or [])
+        if "route_id" not in fields or not fields & {"stops", "stop"}:
+            raise ValueError("El CSV necesita las columnas route_id y stops (o stop).")
+        for row in reader:
+            stops = grouped.setdefault(row["route_id"], [])
+            if "stops" in fields:
+                stops.extend(_split_stops(row["stops"]))
+            elif (row.get("stop") or "").strip():
+                stops.append(row["stop"].strip())
+    return list(grouped.items())
+
+
+# ---------------------------
+# Proceso
+# ---------------------------
+_UNSAFE_FILENAME = re.compile(r"[^\w.-]")
+
+
+def safe_filename(route_id) -> str:
+    """
+    route_id apto como nombre de fichero dentro de --qr-dir (sin "/", ".." ni ocultos).
+    Si hubo que cambiarlo se añade un hash corto para que "a/b" y "a_b" no se pisen.
+    """
+    raw = str(route_id)
+    name = _UNSAFE_FILENAME.sub("_", raw).lstrip(".")[:100]
+    if name != raw or not name:
+        name = f"{name or 'ruta'}-{hashlib.sha1(raw.encode('utf-8')).hexdigest()[:8]}"
+    return name
+
+
+def build_route(route_id, metas, optimize=False):
+    """Enlaces por tramo (y resumen de optimización) de una ruta ya resuelta."""
+    result = {"route_id": route_id, "stops": len(metas)}
+    unresolved = [m["address"] for m in metas if m.get("lat") is None]
+    if unresolved:
+        result["unresolved"] = unresolved
+
+    if optimize and not unresolved and len(metas) > 3:
+        opt = optimize_coords([(m["lat"], m["lon"]) for m in metas])
+        metas = [metas[i] for i in opt["order"]]
+        result["order"] = opt["order"]
+        result["before_km"] = round(opt["before_km"], 3)
+        result["after_km"] = round(opt["after_km"], 3)
+
+    result["legs"] = build_route_legs(metas, optimize=optimize and bool(unresolved))
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="Fichero .csv o .jsonl con las rutas")
+    parser.add_argument("-o", "--output", help="JSONL de salida (por defecto, salida estándar)")
+    parser.add_argument("--qr-dir", help="Carpeta donde escribir un PNG por tramo")
+    parser.add_argument("--optimize", action="store_true", help="Optimizar el orden (origen y destino fijos)")
+    parser.add_argument("--workers", type=int, default=app_utils_core.GEOCODE_MAX_WORKERS,
+                        help="Hilos de geocodificación concurrentes")
+    parser.add_argument("--qps", type=float, default=app_utils_core.GEOCODE_MAX_QPS,
+                        help="Máximo de llamadas por segundo a la API de geocodificación")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="Procesos para renderizar los QR (es la parte más costosa por ruta)")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    routes = read_routes(args.input)
+    app_utils_core.set_geocode_qps(args.qps)
+
+    # 1) Geocodificación de todas las direcciones distintas, una sola vez
+    unique = list(OrderedDict.fromkeys(s for _, stops in routes for s in stops))
+    t_geo = time.perf_counter()
+    resolved = dict(zip(unique, resolve_many(unique, max_workers=args.workers)))
+    t_geo = time.perf_counter() - t_geo
+
+    qr_dir = Path(args.qr_dir) if args.qr_dir else None
+    if qr_dir:
+        qr_dir.mkdir(parents=True, exist_ok=True)
+
+    # 2) Enlaces de cada ruta (barato: sin red y en memoria)
+    results = []
+    skipped = 0
+    for route_id, stops in routes:
+        if len(stops) < 2:
+            print(f"Ruta {route_id}: necesita al menos 2 paradas, se omite.", file=sys.stderr)
+            skipped += 1
+            continue
+        results.append(build_route(route_id, [dict(resolved[s]) for s in stops], optimize=args.optimize))
+
+    # 3) QR en paralelo (en orden) y escritura de una línea por ruta según van saliendo
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    pool = ProcessPoolExecutor(max_workers=args.jobs) if qr_dir and args.jobs > 1 else None
+    try:
+        if qr_dir:
+            urls = [[leg["gmaps"] for leg in r["legs"]] for r in results]
+            all_pngs = pool.map(qr_batch, urls, chunksize=4) if pool else map(qr_batch, urls)
+        else:
+            all_pngs = ([] for _ in results)
+        for result, pngs in zip(results, all_pngs):
+            for leg, png in zip(result["legs"], pngs):
+                qr_path = qr_dir / f"{safe_filename(result['route_id'])}_tramo{leg['index'] + 1}.png"
+                qr_path.write_bytes(png)
+                leg["qr"] = str(qr_path)
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+    finally:
+        if pool:
+            pool.shutdown()
+        if out is not sys.stdout:
+            out.close()
+    done = len(results)
+
+    elapsed = time.perf_counter() - t0
+    rate = done / elapsed if elapsed > 0 else 0.0
+    print(
+        f"{done} rutas ({skipped} omitidas), {len(unique)} direcciones distintas "
+        f"geocodificadas en {t_geo:.2f} s; total {elapsed:.2f} s → {rate:.1f} rutas/s",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
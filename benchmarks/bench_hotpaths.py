@@ -0,0 +1,250 @@
+# benchmarks/bench_hotpaths.py
+"""
+Benchmarks de los caminos calientes de la generación de rutas.
+
+Casos:
+  - resolve_selection con un cliente simulado (fallo de caché y acierto de caché)
+  - build_gmaps_web_url / build_waze_url / build_apple_maps_url con 2–500 paradas
+  - sanitize_waypoints (saneado de paradas de las pestañas Viajero y Turístico)
+  - _qr_image_for (QR del tramo, en frío y cacheado)
+  - almacén de rutas: guardar y cargar
+
+Para cada caso informa operaciones/s (mejor de --repeat rondas) y la memoria
+asignada por operación (pico de tracemalloc). Compara con benchmarks/baseline.json
+y falla si algún caso es más lento o asigna más memoria que lo tolerado.
+
+La velocidad se guarda y se compara relativa a un bucle de referencia de Python puro
+medido en el mismo proceso ("rel"), no en ops/s absolutas: la referencia sirve en
+cualquier máquina. Las ops/s absolutas se guardan solo como información.
+
+Uso:
+    python benchmarks/bench_hotpaths.py                    # comparar con la referencia
+    python benchmarks/bench_hotpaths.py --update-baseline  # guardar nueva referencia
+    python benchmarks/bench_hotpaths.py -k url --json resultados.json
+"""
+import argparse
+import atexit
+import gc
+import itertools
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+
+# Entorno aislado antes de importar la aplicación: sin clave, sin nomenclátor, cachés temporales
+_TMP = tempfile.mkdtemp(prefix="bench-hotpaths-")
+atexit.register(shutil.rmtree, _TMP, ignore_errors=True)
+os.environ["GOOGLE_API_KEY"] = ""
+os.environ["GEOCODE_CACHE_PATH"] = os.path.join(_TMP, "geocode_cache.sqlite3")
+os.environ["GAZETTEER_PATH"] = os.path.join(_TMP, "no-gazetteer.csv")
+sys.path.insert(0, str(ROOT))
+logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+import app_utils_core  # noqa: E402
+from app_utils_core import (  # noqa: E402
+    build_apple_maps_url, build_gmaps_web_url, build_waze_url, resolve_selection, sanitize_waypoints,
+)
+from route_api import StubGeocoder  # noqa: E402
+from route_store import RouteStore, stop_record  # noqa: E402
+from tab_profesional import ui  # noqa: E402
+
+STOP_COUNTS = (2, 10, 100, 500)
+
+
+def _metas(n):
+    return [
+        {"address": f"Carrer {i}, Girona", "coords": f"{41.9 + i * 1e-4:.6f},{2.8 + i * 1e-4:.6f}",
+         "lat": 41.9 + i * 1e-4, "lon": 2.8 + i * 1e-4}
+        for i in range(n)
+    ]
+
+
+def _stops_text(n):
+    # Con vacíos, duplicados y el token optimize, como llega del formulario
+    lines = []
+    for i in range(n):
+        lines.append(f"  Parada {i % (n // 2 or 1)}, Barcelona ")
+        if i % 10 == 0:
+            lines += ["", "optimize"]
+    return "\n".join(lines)
+
+
+# ---------------------------
+# Casos: nombre -> función sin argumentos (una operación)
+# ---------------------------
+def build_cases():
+    cases = {}
+    app_utils_core.set_gmaps_client(StubGeocoder())
+    app_utils_core.set_geocode_qps(0)
+
+    counter = itertools.count()
+    cases["resolve_selection/miss"] = lambda: resolve_selection(f"Carrer Nou {next(counter)}, Girona")
+    resolve_selection("Plaça Independència 1, Girona")
+    cases["resolve_selection/hit"] = lambda: resolve_selection("Plaça Independència 1, Girona")
+
+    for n in STOP_COUNTS:
+        metas = _metas(n)
+        origin, destination, waypoints = metas[0], metas[-1], metas[1:-1]
+        cases[f"url/gmaps/{n}"] = lambda o=origin, d=destination, w=waypoints: build_gmaps_web_url(o, d, w)
+        cases[f"url/waze/{n}"] = lambda o=origin, d=destination: build_waze_url(o, d)
+        cases[f"url/apple/{n}"] = lambda o=origin, d=destination, w=waypoints: build_apple_maps_url(o, d, w)
+
+    for n in (10, 100, 500):
+        text = _stops_text(n)
+        cases[f"sanitize/{n}"] = lambda t=text: sanitize_waypoints(t)
+
+    url = build_gmaps_web_url(*(lambda m: (m[0], m[-1], m[1:-1]))(_metas(11)))
+    qr_counter = itertools.count()
+    cases["qr/cold"] = lambda: ui._qr_image_for(f"{url}&n={next(qr_counter)}")
+    ui._qr_image_for(url)
+    cases["qr/cached"] = lambda: ui._qr_image_for(url)
+
+    store = RouteStore(os.path.join(_TMP, "routes.sqlite3"))
+    points = [stop_record(m["address"], m) for m in _metas(25)]
+    for i in range(50):
+        store.save_route("bench", f"ruta {i}", points)
+    save_counter = itertools.count()
+    cases["route_store/save"] = lambda: store.save_route("bench", f"ruta {next(save_counter) % 50}", points)
+    cases["route_store/load"] = lambda: store.load_routes("bench")
+    return cases
+
+
+# ---------------------------
+# Medición
+# ---------------------------
+def _calibrate(fn, target):
+    """Número de repeticiones para que una ronda dure aproximadamente `target` segundos."""
+    loops = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - t0
+        if elapsed >= target / 10 or loops >= 1 << 20:
+            return max(1, int(loops * target / max(elapsed, 1e-9)))
+        loops *= 10
+
+
+def measure(fn, repeat=5, target=0.2):
+    loops = _calibrate(fn, target)
+    best = float("inf")
+    gc.collect()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            for _ in range(loops):
+                fn()
+            best = min(best, (time.perf_counter() - t0) / loops)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    # Memoria: pico por encima de lo ya asignado durante una operación
+    tracemalloc.start()
+    try:
+        fn()  # calentamiento bajo tracemalloc
+        base, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"ops_per_sec": 1.0 / best, "alloc_kb": max(0, peak - base) / 1024}
+
+
+def _reference_loop():
+    """Trabajo fijo de Python puro (cadenas, dicts, ordenación): mide la velocidad de la máquina."""
+    seen = {}
+    for i in range(200):
+        label = f"Carrer Major {i}, Girona"
+        seen[label.lower()] = label.split(",")[0].upper()
+    return sorted(seen.items())
+
+
+def measure_reference(repeat=5):
+    """ops/s del bucle de referencia en este proceso."""
+    return measure(_reference_loop, repeat=repeat)["ops_per_sec"]
+
+
+def compare(results, baseline, time_tolerance, alloc_tolerance):
+    """Lista de regresiones respecto a la referencia."""
+    failures = []
+    for name, result in results.items():
+        ref = baseline.get(name)
+        if not ref:
+            continue
+        # Sin "rel" (referencia antigua en ops/s absolutas) solo se compara la memoria
+        if "rel" in ref and result["rel"] < ref["rel"] * (1 - time_tolerance):
+            failures.append(f"{name}: {result['rel']:.4g} × referencia < {ref['rel']:.4g} × referencia")
+        # 1 KB de margen absoluto: las asignaciones muy pequeñas varían con el intérprete
+        if result["alloc_kb"] > ref["alloc_kb"] * (1 + alloc_tolerance) + 1.0:
+            failures.append(f"{name}: {result['alloc_kb']:.1f} KB/op > referencia {ref['alloc_kb']:.1f}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", "--filter", help="Solo los casos cuyo nombre contenga este texto")
+    parser.add_argument("--repeat", type=int, default=5, help="Rondas por caso (se toma la mejor)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="Guardar los resultados como referencia")
+    parser.add_argument("--time-tolerance", type=float, default=0.30,
+                        help="Caída de velocidad relativa admitida respecto a la referencia (0.30 = 30%%)")
+    parser.add_argument("--alloc-tolerance", type=float, default=0.25,
+                        help="Aumento de memoria por operación admitido (0.25 = 25%%)")
+    parser.add_argument("--json", type=Path, help="Escribir también los resultados en este fichero")
+    args = parser.parse_args(argv)
+
+    cases = build_cases()
+    if args.filter:
+        cases = {k: v for k, v in cases.items() if args.filter in k}
+
+    # Referencia medida antes y después de los casos (media): compensa cambios de frecuencia
+    reference_before = measure_reference(args.repeat)
+    results = {}
+    for name, fn in cases.items():
+        results[name] = measure(fn, repeat=args.repeat)
+    reference = (reference_before + measure_reference(args.repeat)) / 2
+
+    print(f"referencia: {reference:,.0f} ops/s")
+    print(f"{'caso':<26} {'ops/s':>12} {'rel':>10} {'KB/op':>10}")
+    for name, result in results.items():
+        result["rel"] = result["ops_per_sec"] / reference
+        print(f"{name:<26} {result['ops_per_sec']:>12,.0f} {result['rel']:>10.4g} {result['alloc_kb']:>10.1f}")
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    if args.update_baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8")) if args.baseline.exists() else {}
+        baseline.update({k: {"rel": float(f"{v['rel']:.4g}"), "ops_per_sec": round(v["ops_per_sec"], 1),
+                             "alloc_kb": round(v["alloc_kb"], 2)}
+                         for k, v in results.items()})
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"Referencia guardada en {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"Sin referencia ({args.baseline}); ejecuta con --update-baseline para crearla.")
+        return 0
+    failures = compare(results, json.loads(args.baseline.read_text(encoding="utf-8")),
+                       args.time_tolerance, args.alloc_tolerance)
+    for failure in failures:
+        print("REGRESIÓN: " + failure)
+    if not failures:
+        print("OK: sin regresiones respecto a la referencia")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+# benchmarks/bench_login.py
+"""
+Rendimiento del login con varios usuarios a la vez.
+
+Para cada algoritmo (scrypt, pbkdf2_sha256 y el SHA-256 antiguo) y cada número de
+hilos, mide logins/s: búsqueda en el almacén de usuarios + verificación del hash.
+Como referencia mide también la validación del token de sesión, que es lo que se
+hace en cada rerun después del login.
+
+hashlib.scrypt y pbkdf2_hmac liberan el GIL, así que el rendimiento escala con los
+núcleos hasta saturarlos; el coste por login es deliberado (ver passwords.py).
+
+Uso:
+    python benchmarks/bench_login.py
+    python benchmarks/bench_login.py --users 2000 --threads 1 4 16 --seconds 2
+"""
+import argparse
+import atexit
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import passwords  # noqa: E402
+from passwords import SessionTokens, hash_password, verify_password  # noqa: E402
+from user_store import UserStore  # noqa: E402
+
+_TMP = tempfile.mkdtemp(prefix="bench-login-")
+atexit.register(shutil.rmtree, _TMP, ignore_errors=True)
+
+
+def _legacy_hash(password):
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def build_store(n_users, algorithm):
+    """Almacén temporal con `n_users` usuarios; un hash compartido para no tardar minutos en prepararlo."""
+    store = UserStore(os.path.join(_TMP, f"users-{algorithm}.sqlite3"), config_path=None)
+    password_hash = _legacy_hash("secreto") if algorithm == "sha256" else hash_password("secreto", algorithm)
+    for i in range(n_users):
+        store.register(f"user{i}", f"user{i}@example.com", f"Usuario {i}", password_hash)
+    return store
+
+
+def run_threads(fn, threads, seconds):
+    """Operaciones/s totales con `threads` hilos llamando a fn(i) durante `seconds`."""
+    counts = [0] * threads
+    stop = time.perf_counter() + seconds
+    start = threading.Barrier(threads + 1)
+
+    def worker(k):
+        start.wait()
+        n = 0
+        while time.perf_counter() < stop:
+            fn(k * 7919 + n)
+            n += 1
+        counts[k] = n
+
+    workers = [threading.Thread(target=worker, args=(k,)) for k in range(threads)]
+    for w in workers:
+        w.start()
+    t0 = time.perf_counter()
+    start.wait()
+    for w in workers:
+        w.join()
+    return sum(counts) / (time.perf_counter() - t0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000, help="Usuarios en el almacén")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--seconds", type=float, default=1.0, help="Duración de cada medida")
+    args = parser.parse_args(argv)
+
+    print(f"scrypt n={passwords.SCRYPT_N} r={passwords.SCRYPT_R} p={passwords.SCRYPT_P}, "
+          f"pbkdf2 {passwords.PBKDF2_ITERATIONS} iteraciones, {args.users} usuarios, {os.cpu_count()} CPU")
+    print(f"{'caso':<22} {'hilos':>6} {'logins/s':>12} {'ms/login':>10}")
+    for algorithm in ("scrypt", "pbkdf2_sha256", "sha256"):
+        store = build_store(args.users, algorithm)
+
+        def login(i, store=store):
+            user = store.get_user(f"user{i % args.users}")
+            if not (user and verify_password("secreto", user["password_hash"])):
+                raise AssertionError("login fallido")
+
+        for threads in args.threads:
+            rate = run_threads(login, threads, args.seconds)
+            print(f"{'login/' + algorithm:<22} {threads:>6} {rate:>12,.1f} {threads * 1000 / rate:>10.2f}")
+
+    tokens = SessionTokens()
+    store = build_store(args.users, "sha256")
+    issued = [tokens.issue(f"user{i}", store.get_user(f"user{i}")["password_hash"]) for i in range(args.users)]
+
+    def rerun(i):
+        username = f"user{i % args.users}"
+        user = store.get_user(username)
+        if tokens.validate(issued[i % args.users], user["password_hash"]) != username:
+            raise AssertionError("token no válido")
+
+    for threads in args.threads:
+        rate = run_threads(rerun, threads, args.seconds)
+        print(f"{'rerun/token':<22} {threads:>6} {rate:>12,.1f} {threads * 1000 / rate:>10.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+# benchmarks/bench_startup.py
+"""
+Benchmark de arranque en frío.
+
+Importa photo_agent_app en un proceso limpio con la red bloqueada y falla si:
+  - la importación tarda más de --budget-ms (mediana de --runs ejecuciones), o
+  - se intenta abrir cualquier conexión de red durante la importación.
+
+Uso:
+    python benchmarks/bench_startup.py --budget-ms 3000 --runs 5
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Código que se ejecuta en el proceso hijo
+_CHILD = r"""
+import json, socket, sys, time
+sys.path.insert(0, {root!r})
+attempts = []
+def _blocked(*args, **kwargs):
+    attempts.append(repr(args[:2]))
+    raise OSError("red bloqueada durante el benchmark de arranque")
+socket.socket.connect = _blocked
+socket.create_connection = _blocked
+socket.getaddrinfo = _blocked
+
+t0 = time.perf_counter()
+import photo_agent_app
+elapsed_ms = (time.perf_counter() - t0) * 1000
+time.sleep(0.2)  # margen para que aparezca cualquier hilo de red lanzado en la importación
+print("BENCH_RESULT " + json.dumps({{"import_ms": elapsed_ms, "network_attempts": attempts}}))
+"""
+
+
+def run_once():
+    proc = subprocess.run(
+        [sys.executable, "-c", _CHILD.format(root=str(ROOT))],
+        cwd=str(ROOT), capture_output=True, text=True, timeout=120,
+    )
+    for line in proc.stdout.splitlines():
+        if line.startswith("BENCH_RESULT "):
+            return json.loads(line[len("BENCH_RESULT "):])
+    raise RuntimeError(f"La importación falló:\n{proc.stderr[-2000:]}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=3000.0, help="Tiempo máximo de importación (mediana)")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    results = [run_once() for _ in range(args.runs)]
+    times = [r["import_ms"] for r in results]
+    attempts = [a for r in results for a in r["network_attempts"]]
+    median = statistics.median(times)
+
+    print(f"import photo_agent_app: mediana {median:.0f} ms "
+          f"(min {min(times):.0f}, max {max(times):.0f}, {args.runs} ejecuciones)")
+    ok = True
+    if attempts:
+        print(f"FALLO: {len(attempts)} intento(s) de red durante la importación: {attempts[:3]}")
+        ok = False
+    if median > args.budget_ms:
+        print(f"FALLO: supera el presupuesto de {args.budget_ms:.0f} ms")
+        ok = False
+    if ok:
+        print(f"OK: dentro del presupuesto de {args.budget_ms:.0f} ms y sin red")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
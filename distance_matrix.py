@@ -0,0 +1,122 @@
+# distance_matrix.py
+"""
+Matriz de distancias ortodrómicas (haversine) N×N calculada con NumPy.
+
+- Un único paso vectorizado en float32 (la mitad de memoria que float64).
+- Para N grandes la matriz puede ir a un fichero memory-mapped y se calcula por bloques de filas.
+  El fichero temporal se borra nada más mapearlo (o al salir, si el sistema no lo permite).
+- Las matrices se cachean (LRU) por el conjunto ordenado de coordenadas.
+"""
+import atexit
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+MEMMAP_THRESHOLD = int(os.getenv("DISTANCE_MEMMAP_THRESHOLD", "4000"))  # N a partir del cual se usa disco
+CACHE_SIZE = 16
+_BLOCK_ROWS = 512
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_leftover_files = set()  # ficheros de memmap que no se pudieron borrar al crearlos (Windows)
+
+
+def _to_radians(coords):
+    arr = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    return np.radians(arr).astype(np.float32)
+
+
+def _haversine_block(lat_a, lon_a, lat_b, lon_b, cos_a, cos_b):
+    """Distancias (km) entre las filas `a` y todas las columnas `b`."""
+    dlat = lat_b[None, :] - lat_a[:, None]
+    dlon = lon_b[None, :] - lon_a[:, None]
+    h = np.sin(dlat * 0.5) ** 2 + cos_a[:, None] * cos_b[None, :] * np.sin(dlon * 0.5) ** 2
+    np.clip(h, 0.0, 1.0, out=h)
+    return (2.0 * EARTH_RADIUS_KM) * np.arcsin(np.sqrt(h))
+
+
+def haversine_matrix(coords, memmap_path=None) -> np.ndarray:
+    """
+    Matriz N×N float32 de distancias en km para [(lat, lon), ...].
+    Si se indica `memmap_path` la matriz se escribe en ese fichero por bloques de filas.
+    """
+    rad = _to_radians(coords)
+    lat, lon = rad[:, 0], rad[:, 1]
+    cos_lat = np.cos(lat)
+    n = len(rad)
+
+    if memmap_path is None:
+        return _haversine_block(lat, lon, lat, lon, cos_lat, cos_lat).astype(np.float32, copy=False)
+
+    out = np.memmap(memmap_path, dtype=np.float32, mode="w+", shape=(n, n))
+    for start in range(0, n, _BLOCK_ROWS):
+        stop = min(start + _BLOCK_ROWS, n)
+        out[start:stop] = _haversine_block(
+            lat[start:stop], lon[start:stop], lat, lon, cos_lat[start:stop], cos_lat
+        )
+    out.flush()
+    return out
+
+
+def _cache_key(coords):
+    # 6 decimales ≈ 0,1 m: suficiente para no distinguir la misma geocodificación
+    return tuple((round(float(lat), 6), round(float(lon), 6)) for lat, lon in coords)
+
+
+def get_distance_matrix(coords) -> np.ndarray:
+    """Matriz de distancias cacheada por el orden exacto de `coords`. No modificar el resultado."""
+    key = _cache_key(coords)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    memmap_path = None
+    if len(key) >= MEMMAP_THRESHOLD:
+        fd, memmap_path = tempfile.mkstemp(prefix="distmatrix_", suffix=".f32")
+        os.close(fd)
+    matrix = haversine_matrix(key, memmap_path=memmap_path)
+    matrix.flags.writeable = False
+    if memmap_path is not None:
+        # Ya mapeado, el fichero no hace falta en disco: el sistema libera el espacio al
+        # soltar la última referencia, aunque el proceso termine sin pasar por _discard
+        _remove_or_defer(memmap_path)
+
+    with _cache_lock:
+        _cache[key] = matrix
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _, old = _cache.popitem(last=False)
+            _discard(old)
+    return matrix
+
+
+def _remove_or_defer(path):
+    try:
+        os.remove(path)
+    except OSError:
+        _leftover_files.add(path)
+
+
+def _discard(matrix):
+    """Borra el fichero de respaldo de una matriz expulsada de la caché si aún existe."""
+    filename = getattr(matrix, "filename", None)
+    if filename in _leftover_files:
+        try:
+            os.remove(filename)
+            _leftover_files.discard(filename)
+        except OSError:
+            pass
+
+
+@atexit.register
+def _remove_leftovers():
+    for path in list(_leftover_files):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,171 @@
+# gazetteer.py
+"""
+Nomenclátor local (calles / puntos de interés de nuestra zona de servicio).
+
+Primer nivel de geocodificación, sin red ni clave API: índice exacto por texto
+normalizado y, opcionalmente, búsqueda aproximada por trigramas para erratas o
+variantes ("carrer pau casal 27 sils"). Un candidato aproximado solo se acepta si
+los números y el municipio coinciden exactamente y la calle difiere como mucho en
+erratas por palabra; si no, se sigue con los proveedores remotos.
+
+Formatos de origen:
+  CSV:    columnas name, lat, lon y opcionales address, place_id
+  SQLite: tabla `gazetteer` con las mismas columnas
+"""
+import csv
+import os
+import sqlite3
+import time
+from collections import Counter
+from pathlib import Path
+
+from geocode_cache import normalize_query
+
+GAZETTEER_PATH = Path(os.getenv("GAZETTEER_PATH", ".streamlit/gazetteer.csv"))
+GAZETTEER_FUZZY = os.getenv("GAZETTEER_FUZZY", "1") != "0"
+FUZZY_MIN_SCORE = 0.55      # similitud de Jaccard mínima entre conjuntos de trigramas
+_MAX_POSTING = 1000         # trigramas más frecuentes que esto apenas discriminan: no generan candidatos
+_MAX_CANDIDATES = 32        # candidatos que se puntúan con la similitud exacta
+
+
+def _parts(key):
+    """
+    (calle, números, resto) de una clave normalizada: palabras antes del primer número,
+    los números (portal, CP...) y las palabras a partir de él (municipio).
+    """
+    tokens = key.split()
+    first = next((i for i, t in enumerate(tokens) if t.isdigit()), len(tokens))
+    rest = tokens[first:]
+    return (tokens[:first],
+            [t for t in rest if t.isdigit()],
+            [t for t in rest if not t.isdigit()])
+
+
+def _max_edits(word):
+    """Erratas toleradas en una palabra: ninguna en las cortas ("mas"/"mar" son calles distintas)."""
+    return 0 if len(word) <= 3 else 1 if len(word) <= 7 else 2
+
+
+def _within_edits(a, b, limit):
+    """¿Distancia de edición (con transposiciones) entre a y b <= limit?"""
+    if a == b:
+        return True
+    if limit == 0 or abs(len(a) - len(b)) > limit:
+        return False
+    prev2, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > limit:
+            return False
+        prev2, prev = prev, cur
+    return prev[-1] <= limit
+
+
+def _same_place(query_parts, entry_parts):
+    """Números y municipio idénticos; la calle, palabra a palabra, solo con erratas."""
+    q_street, q_numbers, q_town = query_parts
+    e_street, e_numbers, e_town = entry_parts
+    if q_numbers != e_numbers or q_town != e_town or len(q_street) != len(e_street):
+        return False
+    return all(_within_edits(q, e, _max_edits(e)) for q, e in zip(q_street, e_street))
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Gazetteer:
+    """Índice en memoria de entradas {address, lat, lon, place_id}."""
+
+    def __init__(self, rows=()):
+        self._entries = []
+        self._keys = []
+        self._exact = {}
+        self._postings = {}
+        for row in rows:
+            self.add(**row)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, name, lat, lon, address=None, place_id=None, **_):
+        key = normalize_query(name)
+        if not key or lat in (None, "") or lon in (None, ""):
+            return
+        entry = {
+            "address": (address or name).strip(),
+            "lat": float(lat),
+            "lon": float(lon),
+            "place_id": place_id or None,
+        }
+        idx = len(self._entries)
+        self._entries.append(entry)
+        self._keys.append(key)
+        self._exact.setdefault(key, idx)
+        for g in _trigrams(key):
+            self._postings.setdefault(g, []).append(idx)
+
+    def addresses(self):
+        """Textos de todas las entradas (para el índice de sugerencias)."""
+        return [entry["address"] for entry in self._entries]
+
+    def _result(self, idx, score):
+        out = dict(self._entries[idx])
+        out["resolved_at"] = time.time()
+        out["source"] = "gazetteer"
+        out["score"] = score
+        return out
+
+    def lookup(self, query, fuzzy=GAZETTEER_FUZZY, min_score=FUZZY_MIN_SCORE):
+        """Entrada del nomenclátor para `query` (exacta o aproximada) o None."""
+        key = normalize_query(query)
+        if not key:
+            return None
+        idx = self._exact.get(key)
+        if idx is not None:
+            return self._result(idx, 1.0)
+        if not fuzzy or not self._entries:
+            return None
+
+        # Candidatos: entradas que comparten más trigramas poco frecuentes con la consulta
+        grams = _trigrams(key)
+        hits = Counter()
+        for g in grams:
+            posting = self._postings.get(g)
+            if posting and len(posting) <= _MAX_POSTING:
+                hits.update(posting)
+        parts = _parts(key)
+        best_idx, best_score = None, 0.0
+        for idx, _ in hits.most_common(_MAX_CANDIDATES):
+            if not _same_place(parts, _parts(self._keys[idx])):
+                continue
+            other = _trigrams(self._keys[idx])
+            score = len(grams & other) / len(grams | other)
+            if score > best_score:
+                best_idx, best_score = idx, score
+        if best_idx is None or best_score < min_score:
+            return None
+        return self._result(best_idx, round(best_score, 3))
+
+
+def load_gazetteer(path=GAZETTEER_PATH):
+    """Carga un nomenclátor desde CSV o SQLite. Devuelve None si el fichero no existe."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    if path.suffix.lower() in (".sqlite", ".sqlite3", ".db"):
+        db = sqlite3.connect(str(path))
+        try:
+            db.row_factory = sqlite3.Row
+            rows = [dict(r) for r in db.execute("SELECT * FROM gazetteer")]
+        finally:
+            db.close()
+        return Gazetteer(rows)
+    with path.open(encoding="utf-8-sig", newline="") as fh:
+        return Gazetteer(csv.DictReader(fh))
@@ -0,0 +1,218 @@
+# geocode_cache.py
+"""
+Caché de geocodificación en dos niveles:
+  1) LRU en memoria (microsegundos, por proceso).
+  2) Almacén SQLite en disco (sobrevive a reinicios del proceso).
+
+Las entradas se indexan por el texto normalizado de la consulta y caducan
+según un TTL. Ambos niveles tienen tamaño máximo y expulsan lo menos usado.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from address_normalize import canonical_key
+
+CACHE_PATH = Path(os.getenv("GEOCODE_CACHE_PATH", ".streamlit/geocode_cache.sqlite3"))
+DEFAULT_TTL = int(os.getenv("GEOCODE_CACHE_TTL", str(30 * 24 * 3600)))  # 30 días
+DEFAULT_MEMORY_ITEMS = 2048
+DEFAULT_DISK_ITEMS = 50_000
+
+# Cada cuántas escrituras se revisa el tamaño del almacén en disco
+_PRUNE_EVERY = 256
+
+
+def normalize_query(query) -> str:
+    """Clave de caché: la clave canónica de la dirección (ver address_normalize)."""
+    return canonical_key(query)
+
+
+class GeocodeCache:
+    """LRU en memoria delante de un almacén SQLite, con TTL y límite de tamaño."""
+
+    def __init__(self, path=CACHE_PATH, ttl=DEFAULT_TTL,
+                 max_memory_items=DEFAULT_MEMORY_ITEMS, max_disk_items=DEFAULT_DISK_ITEMS):
+        self.ttl = ttl
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+        self._mem = OrderedDict()  # clave -> (expira_en, valor)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self._db = self._open(path) if path else None
+
+    # ---------------------------
+    # Disco
+    # ---------------------------
+    def _open(self, path):
+        """Abre (o crea) la base de datos. Si el disco no es escribible, solo memoria."""
+        try:
+            path = Path(path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS geocode ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS geocode_accessed ON geocode(accessed_at)")
+            return db
+        except (sqlite3.Error, OSError) as e:
+            print(f"Caché de geocodificación solo en memoria: {e}")
+            return None
+
+    def _disk_get(self, key, now):
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute(
+                "SELECT value, created_at FROM geocode WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if now - created_at > self.ttl:
+                self._db.execute("DELETE FROM geocode WHERE key = ?", (key,))
+                return None
+            self._db.execute("UPDATE geocode SET accessed_at = ? WHERE key = ?", (now, key))
+            return json.loads(value), created_at
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Error leyendo caché de geocodificación: {e}")
+            return None
+
+    def _disk_put(self, key, value, now):
+        if self._db is None:
+            return
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO geocode (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now),
+            )
+            self._writes += 1
+            if self._writes % _PRUNE_EVERY == 0:
+                self._prune_disk(now)
+        except sqlite3.Error as e:
+            print(f"Error escribiendo caché de geocodificación: {e}")
+
+    def _prune_disk(self, now):
+        """Borra caducadas y, si aún sobra, las menos usadas."""
+        self._db.execute("DELETE FROM geocode WHERE created_at < ?", (now - self.ttl,))
+        (count,) = self._db.execute("SELECT COUNT(*) FROM geocode").fetchone()
+        excess = count - self.max_disk_items
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM geocode WHERE key IN ("
+                " SELECT key FROM geocode ORDER BY accessed_at ASC LIMIT ?)",
+                (excess,),
+            )
+
+    # ---------------------------
+    # Memoria
+    # ---------------------------
+    def _mem_put(self, key, value, expires_at):
+        self._mem[key] = (expires_at, value)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_memory_items:
+            self._mem.popitem(last=False)
+
+    # ---------------------------
+    # API pública
+    # ---------------------------
+    def get(self, query):
+        """Devuelve una copia del valor cacheado o None si no existe o ha caducado."""
+        key = normalize_query(query)
+        if not key:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._mem.move_to_end(key)
+                    self.hits += 1
+                    return dict(value)
+                del self._mem[key]
+
+            found = self._disk_get(key, now)
+            if found is None:
+                self.misses += 1
+                return None
+            value, created_at = found
+            self._mem_put(key, value, created_at + self.ttl)
+            self.hits += 1
+            return dict(value)
+
+    def contains(self, query) -> bool:
+        """True si hay un valor vigente; no cuenta como acierto/fallo ni cambia el orden LRU."""
+        key = normalize_query(query)
+        if not key:
+            return False
+        now = time.time()
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None and entry[0] > now:
+                return True
+            if self._db is None:
+                return False
+            try:
+                row = self._db.execute(
+                    "SELECT 1 FROM geocode WHERE key = ? AND created_at >= ?", (key, now - self.ttl)
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"Error leyendo caché de geocodificación: {e}")
+                return False
+            return row is not None
+
+    def put(self, query, value: dict):
+        key = normalize_query(query)
+        if not key or not value:
+            return
+        now = time.time()
+        value = dict(value)
+        with self._lock:
+            self._mem_put(key, value, now + self.ttl)
+            self._disk_put(key, value, now)
+
+    def recent(self, limit=5000) -> list:
+        """Valores vigentes más usados recientemente (para el índice de sugerencias)."""
+        now = time.time()
+        with self._lock:
+            values = [v for exp, v in reversed(self._mem.values()) if exp > now]
+            if self._db is not None and len(values) < limit:
+                try:
+                    rows = self._db.execute(
+                        "SELECT value FROM geocode WHERE created_at >= ? ORDER BY accessed_at DESC LIMIT ?",
+                        (now - self.ttl, limit),
+                    ).fetchall()
+                    values.extend(json.loads(value) for (value,) in rows)
+                except (sqlite3.Error, ValueError) as e:
+                    print(f"Error leyendo caché de geocodificación: {e}")
+        return [dict(v) for v in values[:limit]]
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            if self._db is not None:
+                try:
+                    self._db.execute("DELETE FROM geocode")
+                except sqlite3.Error:
+                    pass
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "memory_items": len(self._mem),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / total) if total else 0.0,
+        }
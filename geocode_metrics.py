@@ -0,0 +1,185 @@
+# geocode_metrics.py
+"""
+Métricas de las llamadas de geocodificación, por proveedor.
+
+  - llamadas (lo que se factura) y resultado: ok, vacío, error
+  - errores por clase (Timeout, ApiError, ...)
+  - histograma de latencias (cubetas estilo Prometheus) y p50/p95/p99 de las últimas muestras
+  - aciertos/fallos de la caché
+
+Se exporta en texto de Prometheus (prometheus_text) o como JSON (snapshot / start_json_dump).
+Con track_usage() se cuentan además las llamadas hechas dentro de un bloque (una sesión, una ruta).
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from pathlib import Path
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_SAMPLES = 2048
+
+_usage = contextvars.ContextVar("geocode_usage", default=None)
+
+
+def _quantile(ordered, q):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class _ProviderStats:
+    def __init__(self):
+        self.calls = 0
+        self.outcomes = Counter()    # ok / empty / error / hit / miss
+        self.errors = Counter()      # clase de error -> n
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.latency_count = 0
+        self.samples = deque(maxlen=_SAMPLES)
+
+
+class GeocodeMetrics:
+    """Contadores en memoria del proceso; seguros entre hilos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._providers = {}
+        self.started_at = time.time()
+
+    def _stats(self, provider):
+        stats = self._providers.get(provider)
+        if stats is None:
+            stats = self._providers[provider] = _ProviderStats()
+        return stats
+
+    def record_call(self, provider):
+        """Una llamada lanzada (cuenta aunque luego se abandone: también consume cuota)."""
+        with self._lock:
+            self._stats(provider).calls += 1
+        usage = _usage.get()
+        if usage is not None:
+            with self._lock:
+                usage[provider] += 1
+
+    def observe(self, provider, seconds, outcome="ok", error=None):
+        """
+        Resultado y latencia de una llamada. `error` es la excepción (se registra su clase)
+        o un nombre de clase; `outcome=None` registra solo el error (p. ej. un timeout).
+        """
+        with self._lock:
+            stats = self._stats(provider)
+            if outcome is not None:
+                stats.outcomes[outcome] += 1
+            if error is not None:
+                if not isinstance(error, str):
+                    error = getattr(error, "kind", None) or type(error).__name__
+                stats.errors[error] += 1
+            if seconds is not None:
+                i = 0
+                while i < len(LATENCY_BUCKETS) and seconds > LATENCY_BUCKETS[i]:
+                    i += 1
+                stats.buckets[i] += 1
+                stats.latency_sum += seconds
+                stats.latency_count += 1
+                stats.samples.append(seconds)
+
+    def reset(self):
+        with self._lock:
+            self._providers.clear()
+            self.started_at = time.time()
+
+    # ---------------------------
+    # Exportación
+    # ---------------------------
+    def snapshot(self) -> dict:
+        """Estado actual como dict serializable (latencias en milisegundos)."""
+        with self._lock:
+            items = [(name, s, sorted(s.samples)) for name, s in self._providers.items()]
+            out = {"started_at": self.started_at, "generated_at": time.time(), "providers": {}}
+            for name, s, ordered in items:
+                hits, misses = s.outcomes.get("hit", 0), s.outcomes.get("miss", 0)
+                entry = {
+                    "calls": s.calls,
+                    "outcomes": dict(s.outcomes),
+                    "errors": dict(s.errors),
+                    "p50_ms": None, "p95_ms": None, "p99_ms": None,
+                    "mean_ms": (s.latency_sum / s.latency_count * 1000) if s.latency_count else None,
+                }
+                for q in (50, 95, 99):
+                    value = _quantile(ordered, q / 100)
+                    entry[f"p{q}_ms"] = value * 1000 if value is not None else None
+                if hits or misses:
+                    entry["hit_ratio"] = hits / (hits + misses)
+                out["providers"][name] = entry
+        return out
+
+    def prometheus_text(self) -> str:
+        """Formato de exposición de texto de Prometheus."""
+        lines = [
+            "# HELP geocode_calls_total Llamadas lanzadas por proveedor.",
+            "# TYPE geocode_calls_total counter",
+        ]
+        with self._lock:
+            providers = sorted(self._providers.items())
+            for name, s in providers:
+                lines.append(f'geocode_calls_total{{provider="{name}"}} {s.calls}')
+            lines += ["# HELP geocode_results_total Resultados por proveedor.",
+                      "# TYPE geocode_results_total counter"]
+            for name, s in providers:
+                for outcome, n in sorted(s.outcomes.items()):
+                    lines.append(f'geocode_results_total{{provider="{name}",outcome="{outcome}"}} {n}')
+            lines += ["# HELP geocode_errors_total Errores por proveedor y clase.",
+                      "# TYPE geocode_errors_total counter"]
+            for name, s in providers:
+                for error, n in sorted(s.errors.items()):
+                    lines.append(f'geocode_errors_total{{provider="{name}",error="{error}"}} {n}')
+            lines += ["# HELP geocode_latency_seconds Latencia de las llamadas.",
+                      "# TYPE geocode_latency_seconds histogram"]
+            for name, s in providers:
+                cumulative = 0
+                for le, n in zip(LATENCY_BUCKETS + ("+Inf",), s.buckets):
+                    cumulative += n
+                    lines.append(f'geocode_latency_seconds_bucket{{provider="{name}",le="{le}"}} {cumulative}')
+                lines.append(f'geocode_latency_seconds_sum{{provider="{name}"}} {s.latency_sum:.6f}')
+                lines.append(f'geocode_latency_seconds_count{{provider="{name}"}} {s.latency_count}')
+        snapshot = self.snapshot()["providers"]
+        lines += ["# HELP geocode_cache_hit_ratio Aciertos / consultas de la caché.",
+                  "# TYPE geocode_cache_hit_ratio gauge"]
+        for name, entry in sorted(snapshot.items()):
+            if "hit_ratio" in entry:
+                lines.append(f'geocode_cache_hit_ratio{{provider="{name}"}} {entry["hit_ratio"]:.4f}')
+        return "\n".join(lines) + "\n"
+
+    def start_json_dump(self, path, interval=60.0):
+        """Escribe snapshot() en `path` cada `interval` segundos (hilo demonio, escritura atómica)."""
+        path = Path(path)
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    tmp = path.with_suffix(path.suffix + ".tmp")
+                    tmp.write_text(json.dumps(self.snapshot(), indent=2), encoding="utf-8")
+                    os.replace(tmp, path)
+                except OSError as e:
+                    print(f"No se pudieron volcar las métricas en {path}: {e}")
+
+        thread = threading.Thread(target=loop, name="geocode-metrics-dump", daemon=True)
+        thread.start()
+        return thread
+
+
+@contextmanager
+def track_usage():
+    """Cuenta las llamadas por proveedor hechas dentro del bloque (también desde hilos lanzados con el contexto)."""
+    usage = Counter()
+    token = _usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _usage.reset(token)
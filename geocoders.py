@@ -0,0 +1,423 @@
+# geocoders.py
+"""
+Cadena de proveedores de geocodificación.
+
+Orden habitual: caché → nomenclátor local → Google → Nominatim (OSM).
+Los proveedores locales se consultan en línea; los remotos van con:
+  - timeout por proveedor,
+  - circuit breaker (tras varios fallos seguidos se salta el proveedor un tiempo),
+  - petición "hedged" opcional: si el primero no ha respondido en su p95 de latencia,
+    se lanza el siguiente en paralelo y gana la primera respuesta válida.
+
+Cualquier objeto con `name`, `remote`, `timeout` y `geocode(query) -> dict | None`
+sirve como proveedor, lo que permite verificar la cadena con proveedores falsos.
+Si tiene `limiter` (RateLimiter), la cadena espera su turno antes de llamarlo: el
+tiempo de espera propio no cuenta para el timeout, el hedge ni el circuit breaker.
+Esa espera tiene su propio límite (`queue_timeout`, desde que se encola): con el pool
+lleno de llamadas colgadas, geocode() termina igualmente.
+
+"No encontrado" (None) y "no se pudo preguntar" son distintos: si ningún remoto llega
+a responder (errores, timeouts o circuit breaker abierto), geocode() lanza GeocodeError.
+"""
+import json
+import logging
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+DEFAULT_TIMEOUT = 5.0
+HEDGE_MIN_DELAY = 0.15      # nunca se lanza la petición de respaldo antes de esto
+HEDGE_DEFAULT_DELAY = 0.8   # retardo mientras no hay muestras suficientes para el p95
+_POLL_INTERVAL = 0.05       # comprobación de llamadas que aún esperan turno (limitador o pool)
+QUEUE_TIMEOUT = 30.0        # espera máxima de turno (limitador o pool) antes de abandonar la llamada
+_MIN_SAMPLES = 20
+
+logger = logging.getLogger(__name__)
+
+
+class GeocodeError(Exception):
+    """Error de un proveedor (con el mensaje ya limpio de claves); `kind` es la clase original."""
+
+    def __init__(self, message, kind=None):
+        super().__init__(message)
+        self.kind = kind or type(self).__name__
+
+
+class RateLimiter:
+    """Reparte los inicios de llamada para no superar `qps` por segundo (compartido entre hilos)."""
+
+    def __init__(self, qps):
+        self.interval = 1.0 / qps if qps and qps > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def set_qps(self, qps):
+        with self._lock:
+            self.interval = 1.0 / qps if qps and qps > 0 else 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class CircuitBreaker:
+    """Cerrado → abierto tras `threshold` fallos seguidos; semiabierto (una prueba) pasado `reset_after`."""
+
+    def __init__(self, threshold=5, reset_after=30.0):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_after:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "half-open":
+                # Dejamos pasar una sola prueba: si falla, vuelve a abrirse
+                self.opened_at = time.monotonic()
+                return True
+            return state == "closed"
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Últimas latencias de un proveedor, para estimar su p95."""
+
+    def __init__(self, size=200):
+        self._samples = deque(maxlen=size)
+
+    def add(self, seconds):
+        self._samples.append(seconds)
+
+    def p95(self, default=None):
+        if len(self._samples) < _MIN_SAMPLES:
+            return default
+        ordered = sorted(self._samples)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+
+# ---------------------------
+# Proveedores
+# ---------------------------
+class CacheProvider:
+    name = "cache"
+    remote = False
+    timeout = None
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def geocode(self, query):
+        return self.cache.get(query)
+
+
+class GazetteerProvider:
+    name = "local"
+    remote = False
+    timeout = None
+
+    def __init__(self, get_gazetteer):
+        self._get = get_gazetteer
+
+    def geocode(self, query):
+        gazetteer = self._get()
+        return gazetteer.lookup(query) if gazetteer is not None else None
+
+
+class GoogleProvider:
+    name = "google"
+    remote = True
+
+    def __init__(self, get_client, limiter=None, secret=None, timeout=DEFAULT_TIMEOUT):
+        self._get_client = get_client
+        self.limiter = limiter
+        self.secret = secret
+        self.timeout = timeout
+
+    def available(self):
+        return self._get_client() is not None
+
+    def geocode(self, query):
+        client = self._get_client()
+        if client is None:
+            return None
+        try:
+            results = client.geocode(query)
+        except Exception as e:
+            text = str(e)
+            if self.secret:
+                text = text.replace(self.secret, "***")
+            raise GeocodeError(f"{type(e).__name__}: {text}", type(e).__name__) from None
+        if not results:
+            return None
+        location = results[0]['geometry']['location']
+        return {
+            "address": results[0]['formatted_address'],
+            "lat": location['lat'],
+            "lon": location['lng'],
+            "place_id": results[0].get('place_id'),
+            "resolved_at": time.time(),
+        }
+
+
+class NominatimProvider:
+    """Nominatim (OpenStreetMap). La política de uso pide User-Agent propio y máx. 1 petición/s."""
+
+    name = "nominatim"
+    remote = True
+
+    def __init__(self, base_url="https://nominatim.openstreetmap.org", user_agent="genera-tu-ruta/1.0",
+                 qps=1.0, timeout=DEFAULT_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.user_agent = user_agent
+        self.limiter = RateLimiter(qps)
+        self.timeout = timeout
+
+    def available(self):
+        return True
+
+    def geocode(self, query):
+        url = f"{self.base_url}/search?" + urllib.parse.urlencode({"q": query, "format": "jsonv2", "limit": 1})
+        req = urllib.request.Request(url, headers={"User-Agent": self.user_agent})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                data = json.loads(resp.read().decode("utf-8"))
+        except Exception as e:
+            raise GeocodeError(f"{type(e).__name__}: {e}", type(e).__name__) from None
+        if not data:
+            return None
+        first = data[0]
+        return {
+            "address": first.get("display_name") or query,
+            "lat": float(first["lat"]),
+            "lon": float(first["lon"]),
+            "place_id": f"osm:{first.get('osm_type', '')}:{first.get('osm_id', '')}",
+            "resolved_at": time.time(),
+        }
+
+
+# ---------------------------
+# Cadena
+# ---------------------------
+class ProviderChain:
+    """Consulta los proveedores en orden; guarda en `cache` lo que devuelvan los remotos."""
+
+    def __init__(self, providers, cache=None, hedge=True, max_workers=16,
+                 breaker_threshold=5, breaker_reset=30.0, metrics=None, queue_timeout=QUEUE_TIMEOUT):
+        self.providers = list(providers)
+        self.queue_timeout = queue_timeout
+        self.cache = cache
+        self.hedge = hedge
+        self.metrics = metrics  # GeocodeMetrics opcional
+        self.breakers = {p.name: CircuitBreaker(breaker_threshold, breaker_reset) for p in self.providers}
+        self.latency = {p.name: LatencyTracker() for p in self.providers}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="geocoder")
+        self._calls_lock = threading.Lock()  # reparte cada llamada entre "terminada" y "abandonada"
+
+    def geocode(self, query):
+        for provider in self.providers:
+            if not provider.remote:
+                result = self._call_local(provider, query)
+                if result is not None:
+                    return result
+
+        remotes = [p for p in self.providers if p.remote and getattr(p, "available", lambda: True)()]
+        result = self._geocode_remote(query, remotes) if remotes else None
+        if result is not None and self.cache is not None:
+            self.cache.put(query, result)
+        return result
+
+    def _call_local(self, provider, query):
+        if self.metrics is None:
+            return provider.geocode(query)
+        self.metrics.record_call(provider.name)
+        t0 = time.perf_counter()
+        result = provider.geocode(query)
+        if provider.name == "cache":
+            outcome = "hit" if result is not None else "miss"
+        else:
+            outcome = "ok" if result is not None else "empty"
+        self.metrics.observe(provider.name, time.perf_counter() - t0, outcome)
+        return result
+
+    def _call(self, provider, query, call):
+        """Llamada en un hilo del pool; `call["started"]` marca cuándo empieza de verdad."""
+        limiter = getattr(provider, "limiter", None)
+        if limiter is not None:
+            limiter.wait()
+        if call["cancelled"]:
+            # Otro proveedor ya respondió mientras esperábamos turno: no gastamos cuota
+            return None
+        call["started"] = time.monotonic()
+        t0 = time.perf_counter()
+        try:
+            result = provider.geocode(query)
+        except Exception as e:
+            if self._finish(call) and self.metrics is not None:
+                self.metrics.observe(provider.name, time.perf_counter() - t0, "error", e)
+            raise
+        elapsed = time.perf_counter() - t0
+        self.latency[provider.name].add(elapsed)
+        # Si ya se contó como timeout, la respuesta tardía no se registra otra vez
+        if self._finish(call) and self.metrics is not None:
+            self.metrics.observe(provider.name, elapsed, "ok" if result is not None else "empty")
+        return result
+
+    def _finish(self, call):
+        """Marca la llamada como terminada; False si ya se había abandonado por timeout."""
+        with self._calls_lock:
+            if call["abandoned"]:
+                return False
+            call["finished"] = True
+            return True
+
+    def _abandon(self, call):
+        """Marca la llamada como abandonada; False si acaba de terminar (se recoge en la siguiente vuelta)."""
+        with self._calls_lock:
+            if call["finished"]:
+                return False
+            call["abandoned"] = call["cancelled"] = True
+            return True
+
+    def _hedge_delay(self, provider):
+        p95 = self.latency[provider.name].p95(HEDGE_DEFAULT_DELAY)
+        return max(HEDGE_MIN_DELAY, p95)
+
+    def _geocode_remote(self, query, remotes):
+        """Recorre los remotos; con hedge, lanza el siguiente si el actual tarda más que su p95."""
+        pending = {}   # future -> (proveedor, estado de la llamada)
+        queue = list(remotes)
+        failures = []  # (proveedor, motivo, clase de error) de los que no llegaron a responder
+        answered = False
+
+        def launch():
+            # El circuit breaker se consulta al lanzar: un proveedor que no llega a usarse
+            # no gasta la petición de prueba del estado semiabierto
+            while queue:
+                provider = queue.pop(0)
+                if self.breakers[provider.name].allow():
+                    if self.metrics is not None:
+                        self.metrics.record_call(provider.name)
+                    call = {"submitted": time.monotonic(), "started": None,
+                            "cancelled": False, "finished": False, "abandoned": False}
+                    pending[self._pool.submit(self._call, provider, query, call)] = (provider, call)
+                    return
+                failures.append((provider.name, "circuit breaker abierto", "CircuitOpen"))
+
+        def cancel_pending():
+            for future, (_, call) in pending.items():
+                call["cancelled"] = True
+                future.cancel()
+
+        launch()
+        while pending:
+            # Timeout y hedge cuentan desde que la llamada empieza; la espera de turno,
+            # desde que se encola
+            now = time.monotonic()
+            wait_for = None
+            for provider, call in pending.values():
+                left = self._deadline(provider, call) - now
+                if call["started"] is None:
+                    left = min(left, _POLL_INTERVAL)
+                wait_for = left if wait_for is None else min(wait_for, left)
+            # El hedge mira la última llamada lanzada: un respaldo cada p95, no todos a la vez
+            last_provider, last_call = next(reversed(pending.values()))
+            hedge_due = False
+            if self.hedge and queue and last_call["started"] is not None:
+                hedge_in = last_call["started"] + self._hedge_delay(last_provider) - now
+                hedge_due = hedge_in <= 0
+                wait_for = min(wait_for, max(0.0, hedge_in))
+            done = set()
+            if not hedge_due:
+                done, _ = wait(list(pending), timeout=max(0.0, wait_for), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                provider, _ = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    self.breakers[provider.name].record_failure()
+                    failures.append((provider.name, str(e), getattr(e, "kind", None) or type(e).__name__))
+                    logger.warning("Error geocodificando %r con %s: %s", query, provider.name, e)
+                    continue
+                self.breakers[provider.name].record_success()
+                answered = True
+                if result is not None:
+                    cancel_pending()
+                    return result
+
+            # Llamadas que han superado su plazo se abandonan. Un timeout del proveedor cuenta
+            # como fallo; no haber tenido turno (limitador o pool saturados) es cosa nuestra
+            now = time.monotonic()
+            for future, (provider, call) in list(pending.items()):
+                if now < self._deadline(provider, call) or not self._abandon(call):
+                    continue
+                pending.pop(future)
+                future.cancel()
+                if call["started"] is None:
+                    kind, reason = "QueueTimeout", "sin turno a tiempo"
+                else:
+                    kind, reason = "Timeout", "sin respuesta a tiempo"
+                    self.breakers[provider.name].record_failure()
+                if self.metrics is not None:
+                    self.metrics.observe(provider.name, None, None, kind)
+                failures.append((provider.name, reason, kind))
+                logger.warning("%s geocodificando %r con %s", kind, query, provider.name)
+
+            # Sin nada en vuelo (fallo o sin resultado) o el actual va lento: siguiente proveedor
+            if queue and (not pending or (self.hedge and not done and self._slow(pending))):
+                launch()
+        if not answered and failures:
+            # Nadie dijo "no existe": es un fallo (cuota, clave, red...), no una dirección desconocida
+            raise GeocodeError("; ".join(f"{name}: {reason}" for name, reason, _ in failures), failures[-1][2])
+        return None
+
+    def _deadline(self, provider, call):
+        """Instante en que se abandona la llamada: timeout si ya empezó, queue_timeout si espera turno."""
+        if call["started"] is None:
+            return call["submitted"] + self.queue_timeout
+        return call["started"] + (provider.timeout or DEFAULT_TIMEOUT)
+
+    def _slow(self, pending):
+        """¿La última llamada lanzada lleva más que su p95?"""
+        provider, call = next(reversed(pending.values()))
+        started = call["started"]
+        return started is not None and time.monotonic() - started >= self._hedge_delay(provider)
+
+    def status(self) -> dict:
+        """Estado de los circuit breakers y p95 de latencia por proveedor."""
+        return {
+            p.name: {
+                "breaker": self.breakers[p.name].state,
+                "p95_ms": (lambda v: v * 1000 if v is not None else None)(self.latency[p.name].p95()),
+            }
+            for p in self.providers
+        }
@@ -0,0 +1,117 @@
+# import_profile.py
+"""
+Perfil del tiempo de importación al arrancar (IMPORT_PROFILE=1).
+
+Mide cada módulo que se importa a partir de install(): tiempo acumulado (con sus
+propias importaciones) y propio (sin ellas), como `python -X importtime`, pero
+activable con una variable de entorno (en Streamlit Cloud no se pueden pasar
+opciones al intérprete). dump() imprime el informe ordenado por tiempo propio y,
+con IMPORT_PROFILE_PATH, lo guarda también en JSON.
+
+Sin la variable, install() no hace nada y no hay ningún coste.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from importlib.abc import MetaPathFinder
+
+ENABLED = os.getenv("IMPORT_PROFILE", "").strip().lower() not in ("", "0", "false", "no")
+PROFILE_PATH = os.getenv("IMPORT_PROFILE_PATH", "")
+
+_records = {}                 # módulo -> (acumulado, propio) en segundos
+_local = threading.local()    # pila de tiempos de hijos por hilo
+_started_at = None
+_dumped = False
+
+
+class _TimedLoader:
+    """Envuelve el loader real solo para cronometrar exec_module; el resto se delega."""
+
+    def __init__(self, loader, name):
+        self._loader = loader
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(self._loader, attr)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        # El módulo debe ver su loader real (importlib.resources, pkgutil...)
+        module.__loader__ = self._loader
+        if getattr(module, "__spec__", None) is not None:
+            module.__spec__.loader = self._loader
+        stack = _local.__dict__.setdefault("stack", [])
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            _records[self._name] = (elapsed, elapsed - children)
+
+
+class _TimingFinder(MetaPathFinder):
+    """Primer finder de sys.meta_path: pregunta al resto y envuelve el loader que encuentren."""
+
+    def find_spec(self, name, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is None:
+                continue
+            if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                spec.loader = _TimedLoader(spec.loader, name)
+            return spec
+        return None
+
+
+_finder = _TimingFinder()
+
+
+def install():
+    """Empieza a medir (idempotente). No hace nada si IMPORT_PROFILE no está activo."""
+    global _started_at
+    if not ENABLED or _finder in sys.meta_path:
+        return
+    _started_at = time.perf_counter()
+    sys.meta_path.insert(0, _finder)
+
+
+def report(limit=40) -> str:
+    """Informe de texto: los `limit` módulos con más tiempo propio."""
+    rows = sorted(_records.items(), key=lambda kv: -kv[1][1])
+    total = sum(own for _, own in _records.values())
+    lines = [f"Importaciones: {len(rows)} módulos, {total * 1000:.1f} ms en total",
+             f"{'propio ms':>10} {'acum. ms':>10}  módulo"]
+    for name, (cumulative, own) in rows[:limit]:
+        lines.append(f"{own * 1000:>10.1f} {cumulative * 1000:>10.1f}  {name}")
+    return "\n".join(lines)
+
+
+def dump(label="primer render"):
+    """Imprime el informe una vez por proceso (y lo guarda en IMPORT_PROFILE_PATH si se indicó)."""
+    global _dumped
+    if not ENABLED or _dumped:
+        return
+    _dumped = True
+    elapsed = time.perf_counter() - _started_at if _started_at is not None else 0.0
+    print(f"[import_profile] {elapsed * 1000:.1f} ms desde el arranque hasta {label}")
+    print(report())
+    if PROFILE_PATH:
+        data = {
+            "elapsed_ms": elapsed * 1000,
+            "modules": {name: {"cumulative_ms": c * 1000, "self_ms": s * 1000} for name, (c, s) in _records.items()},
+        }
+        try:
+            with open(PROFILE_PATH, "w", encoding="utf-8") as fh:
+                json.dump(data, fh, indent=2, sort_keys=True)
+        except OSError as e:
+            print(f"No se pudo guardar el perfil de importación en {PROFILE_PATH}: {e}")
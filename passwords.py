@@ -0,0 +1,137 @@
+# passwords.py
+"""
+Hash de contraseñas con sal por usuario y coste configurable (solo hashlib).
+
+Formatos guardados (el algoritmo y el coste van en el propio hash, así se pueden
+subir los parámetros sin invalidar las contraseñas ya guardadas):
+  scrypt$<n>$<r>$<p>$<sal>$<hash>          (por defecto)
+  pbkdf2_sha256$<iteraciones>$<sal>$<hash>
+  <64 hex>                                 SHA-256 sin sal (formato antiguo, solo verificación)
+
+needs_rehash() indica si un hash guardado es antiguo o de menor coste que el actual:
+tras un login correcto se vuelve a calcular con la contraseña en claro.
+
+SessionTokens guarda las sesiones ya autenticadas: el hash costoso se calcula una vez
+por login y en cada rerun basta una consulta en memoria.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import re
+import secrets
+import threading
+import time
+
+PASSWORD_HASHER = os.getenv("PASSWORD_HASHER", "scrypt").strip().lower()
+SCRYPT_N = int(os.getenv("PASSWORD_SCRYPT_N", str(2 ** 14)))
+SCRYPT_R = int(os.getenv("PASSWORD_SCRYPT_R", "8"))
+SCRYPT_P = int(os.getenv("PASSWORD_SCRYPT_P", "1"))
+PBKDF2_ITERATIONS = int(os.getenv("PASSWORD_PBKDF2_ITERATIONS", "600000"))
+SESSION_TOKEN_TTL = float(os.getenv("SESSION_TOKEN_TTL", str(12 * 3600)))  # 12 h
+
+_SALT_BYTES = 16
+_LEGACY_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def _b64(raw: bytes) -> str:
+    return base64.b64encode(raw).decode("ascii")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.b64decode(text.encode("ascii"))
+
+
+def _scrypt(password: str, salt: bytes, n, r, p) -> bytes:
+    # maxmem: la memoria que necesita scrypt (128·r·n) con margen; el límite por defecto de OpenSSL es 32 MB
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * r * n + (1 << 20), dklen=32)
+
+
+def _pbkdf2(password: str, salt: bytes, iterations) -> bytes:
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+
+
+def hash_password(password: str, algorithm=None) -> str:
+    """Hash con sal nueva y los parámetros configurados."""
+    algorithm = algorithm or PASSWORD_HASHER
+    salt = os.urandom(_SALT_BYTES)
+    if algorithm == "scrypt":
+        digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+        return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(digest)}"
+    if algorithm == "pbkdf2_sha256":
+        digest = _pbkdf2(password, salt, PBKDF2_ITERATIONS)
+        return f"pbkdf2_sha256${PBKDF2_ITERATIONS}${_b64(salt)}${_b64(digest)}"
+    raise ValueError(f"Algoritmo de contraseñas desconocido: {algorithm}")
+
+
+def verify_password(password: str, stored: str) -> bool:
+    """True si `password` corresponde al hash guardado (en cualquiera de los formatos)."""
+    stored = str(stored or "")
+    parts = stored.split("$")
+    try:
+        if parts[0] == "scrypt" and len(parts) == 6:
+            n, r, p = (int(x) for x in parts[1:4])
+            expected = _unb64(parts[5])
+            return hmac.compare_digest(_scrypt(password, _unb64(parts[4]), n, r, p), expected)
+        if parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+            expected = _unb64(parts[3])
+            return hmac.compare_digest(_pbkdf2(password, _unb64(parts[2]), int(parts[1])), expected)
+    except (ValueError, TypeError):
+        return False
+    if _LEGACY_RE.match(stored):
+        return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored)
+    return False
+
+
+def needs_rehash(stored: str) -> bool:
+    """True si el hash es del formato antiguo, de otro algoritmo o de menor coste que el configurado."""
+    parts = str(stored or "").split("$")
+    if parts[0] != PASSWORD_HASHER:
+        return True
+    try:
+        if parts[0] == "scrypt":
+            return (int(parts[1]), int(parts[2]), int(parts[3])) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+        return int(parts[1]) < PBKDF2_ITERATIONS
+    except (IndexError, ValueError):
+        return True
+
+
+class SessionTokens:
+    """
+    Sesiones autenticadas en memoria del proceso: token -> (usuario, caducidad, hash).
+    Si cambia el hash guardado del usuario (nueva contraseña), sus tokens dejan de valer.
+    """
+
+    def __init__(self, ttl=SESSION_TOKEN_TTL):
+        self.ttl = ttl
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    def issue(self, username, password_hash) -> str:
+        token = secrets.token_urlsafe(32)
+        now = time.time()
+        with self._lock:
+            # Purga de caducados al emitir: el diccionario no crece sin límite
+            expired = [t for t, (_, expires, _) in self._tokens.items() if expires <= now]
+            for t in expired:
+                del self._tokens[t]
+            self._tokens[token] = (username, now + self.ttl, password_hash)
+        return token
+
+    def validate(self, token, current_hash=None):
+        """Usuario del token, o None si no existe, caducó o la contraseña cambió desde el login."""
+        if not token:
+            return None
+        with self._lock:
+            entry = self._tokens.get(token)
+            if entry is None:
+                return None
+            username, expires, password_hash = entry
+            if expires <= time.time() or (current_hash is not None and current_hash != password_hash):
+                del self._tokens[token]
+                return None
+        return username
+
+    def revoke(self, token):
+        with self._lock:
+            self._tokens.pop(token, None)
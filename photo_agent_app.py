@@ -1,13 +1,15 @@
 # photo_agent_app.py - Código Final Funcional (Corrección de Importación Final)
+import import_profile
+import_profile.install()  # IMPORT_PROFILE=1: mide todo lo que se importa a partir de aquí
+
 import streamlit as st
-import yaml
-from yaml.loader import SafeLoader
-from pathlib import Path
-from PIL import Image
-import hashlib
 import os
 from dotenv import load_dotenv
 
+from i18n import available_languages, texts
+from passwords import SessionTokens, hash_password, needs_rehash, verify_password
+from user_store import UserStore
+
 # --- Ocultar avisos del sistema Streamlit (líneas amarillas) ---
 st.markdown(
     """
@@ -27,46 +29,42 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
-CONFIG_FILE = Path('config.yaml')
-
-def load_config():
-    """Carga configuraciones de YAML. Inicializa cookies si el archivo no existe."""
-    try:
-        with open(CONFIG_FILE) as file:
-            return yaml.load(file, Loader=SafeLoader)
-    except FileNotFoundError:
-        return {
-            'credentials': {'usernames': {}}, 
-            'cookie': {
-                'expiry_days': 30,
-                'key': hashlib.sha256(os.urandom(32)).hexdigest(),
-                'name': 'auth_cookie'
-            }
-        }
-
-def save_config(config):
-    """Guarda configuraciones en YAML."""
-    with open(CONFIG_FILE, 'w') as file:
-        yaml.dump(config, file, default_flow_style=False)
+@st.cache_resource
+def get_user_store():
+    """Almacén de usuarios compartido por todas las sesiones (importa config.yaml cuando cambia)."""
+    return UserStore()
 
-def hash_password(password):
-    """Función simple para hashear la contraseña (usando SHA256)."""
-    return hashlib.sha256(password.encode()).hexdigest()
+@st.cache_resource
+def get_session_tokens():
+    """Sesiones ya autenticadas: el hash de la contraseña se calcula una vez por login."""
+    return SessionTokens()
 
-def check_password(username, password_unhashed, config):
-    """Verifica si la contraseña coincide."""
-    user_data = config['credentials']['usernames'].get(username)
+def check_password(username, password_unhashed):
+    """
+    Verifica la contraseña y devuelve los datos del usuario (o None). Si el hash guardado
+    es del formato antiguo (SHA-256 sin sal) o de menor coste, se recalcula aquí.
+    """
+    store = get_user_store()
+    user_data = store.get_user(username)
+    if not user_data or not verify_password(password_unhashed, user_data['password_hash']):
+        return None
+    if needs_rehash(user_data['password_hash']):
+        user_data['password_hash'] = hash_password(password_unhashed)
+        store.set_password_hash(username, user_data['password_hash'])
+    return user_data
+
+def session_is_valid():
+    """El token de la sesión sigue vigente (sin caducar y sin cambio de contraseña desde el login)."""
+    username = st.session_state.get('username')
+    user_data = get_user_store().get_user(username) if username else None
     if not user_data:
         return False
-    
-    stored_hash = user_data['password_hash']
-    input_hash = hash_password(password_unhashed)
-    
-    return stored_hash == input_hash
+    token = st.session_state.get('auth_token')
+    return get_session_tokens().validate(token, user_data['password_hash']) == username
 
 def clear_route_state():
     """Función que borra las variables de ruta al cerrar sesión."""
-    for key in ["prof_points", "saved_routes", "route_name_input", "saved_choice", "_current_routes_user", "logged_in", "username", "name", "list_version"]:
+    for key in ["prof_points", "saved_routes", "route_name_input", "saved_choice", "_current_routes_user", "logged_in", "username", "name", "list_version", "resolved_route", "point_meta", "geocode_usage", "import_report", "export_version", "auth_token", "travel_mode", "route_type", "departure_time", "stop_minutes"]:
         if key in st.session_state:
             del st.session_state[key]
 
@@ -77,9 +75,6 @@ if not os.getenv("GOOGLE_API_KEY"):
     st.sidebar.warning("⚠️ Clave API de Google no configurada. La Geocodificación será SIMULADA.")
 
 
-# Cargar configuraciones
-config = load_config()
-
 # Inicialización de estado de Autenticación
 def init_ui_state():
     """Inicializa las claves de logged_in, username, etc."""
@@ -106,10 +101,60 @@ def _import_ui():
 
 mostrar_profesional = _import_ui()
 
+# Usuarios que ven el panel de métricas de geocodificación. Vacío por defecto: el registro
+# está abierto y cualquiera podría darse de alta con un nombre como "admin"
+ADMIN_USERS = {u.strip() for u in os.getenv("ADMIN_USERS", "").split(",") if u.strip()}
+
+def admin_metrics_panel():
+    """Panel lateral con el consumo y la latencia de la geocodificación (solo administradores)."""
+    from app_utils_core import client_health, geocode_metrics_text, get_geocode_metrics, get_geocoder_chain
+
+    T = texts()
+    with st.sidebar.expander(T("admin_metrics_title")):
+        st.caption(T("admin_google_status", status=client_health()['status']))
+        snapshot = get_geocode_metrics().snapshot()["providers"]
+        if not snapshot:
+            st.caption(T("admin_no_calls"))
+        else:
+            rows = []
+            for name, entry in snapshot.items():
+                rows.append({
+                    "provider": name,
+                    "calls": entry["calls"],
+                    "errors": sum(entry["errors"].values()),
+                    "hits": f"{entry['hit_ratio']:.0%}" if "hit_ratio" in entry else "",
+                    "p50 ms": round(entry["p50_ms"], 1) if entry["p50_ms"] is not None else None,
+                    "p95 ms": round(entry["p95_ms"], 1) if entry["p95_ms"] is not None else None,
+                    "p99 ms": round(entry["p99_ms"], 1) if entry["p99_ms"] is not None else None,
+                })
+            st.dataframe(
+                rows, hide_index=True, use_container_width=True,
+                column_config={"provider": T("admin_col_provider"), "calls": T("admin_col_calls"),
+                               "errors": T("admin_col_errors"), "hits": T("admin_col_hits")},
+            )
+            errors = {f"{name}: {kind}": n for name, entry in snapshot.items() for kind, n in entry["errors"].items()}
+            if errors:
+                st.caption(T("admin_errors", errors=", ".join(f"{k} ×{n}" for k, n in errors.items())))
+        breakers = {name: s["breaker"] for name, s in get_geocoder_chain().status().items() if s["breaker"] != "closed"}
+        if breakers:
+            st.warning(T("admin_open_breakers", names=", ".join(breakers)))
+        session_calls = st.session_state.get("geocode_usage") or {}
+        st.caption(T("admin_session_calls", calls=", ".join(f"{k} {v}" for k, v in session_calls.items()) or "0"))
+        st.download_button(T("admin_download"), geocode_metrics_text(), file_name="geocode_metrics.txt",
+                           mime="text/plain", use_container_width=True)
+
+
+def language_selector():
+    """Idioma de la interfaz (clave "lang" de la sesión); solo se carga el catálogo del idioma elegido."""
+    T = texts()
+    st.sidebar.selectbox(T("lang_label"), options=available_languages(), key="lang",
+                         format_func=lambda code: T.get(f"lang_{code}", code.upper()))
+
 
 def main():
     
     st.title("🗺️ Planificador de Rutas")
+    language_selector()
 
     # Si estamos logeados, y el usuario cargado no es el de las rutas, recargamos las rutas
     if st.session_state.get('logged_in') and st.session_state.get('_current_routes_user') != st.session_state.get('username'):
@@ -130,6 +175,12 @@ def main():
         st.session_state["saved_choice"] = ""
 
 
+    if st.session_state['logged_in'] and not session_is_valid():
+        # Sesión caducada o contraseña cambiada: vuelta al login
+        clear_route_state()
+        st.session_state['logged_in'] = False
+        st.session_state['username'] = None
+
     if st.session_state['logged_in']:
         # ------------------- PÁGINA PRINCIPAL (LOGEADO) -------------------
         st.sidebar.markdown("---")
@@ -137,11 +188,15 @@ def main():
         
         # Botón de Logout MANUAL
         if st.sidebar.button('Logout', use_container_width=True):
+            get_session_tokens().revoke(st.session_state.get('auth_token'))
             clear_route_state()
             st.session_state['logged_in'] = False
             st.session_state['username'] = None
             st.rerun() 
         
+        if st.session_state['username'] in ADMIN_USERS:
+            admin_metrics_panel()
+
         # 2. RENDERIZAR LA APLICACIÓN PRINCIPAL
         mostrar_profesional() 
         
@@ -169,11 +224,10 @@ def main():
         col_spacer1, col_content, col_spacer2 = st.columns([1, 4, 1])
 
         with col_content:
-            try:
-                # Intenta cargar el logo
-                logo = Image.open("logo.png")
-                st.image(logo, width=150) 
-            except FileNotFoundError:
+            # Logo si existe; st.image lee la ruta directamente (sin importar PIL en el arranque)
+            if os.path.exists("logo.png"):
+                st.image("logo.png", width=150)
+            else:
                 st.write("🗺️") 
                 
             st.markdown("<h1 style='text-align: center; margin-top: -15px;'>Planificador de Rutas</h1>", unsafe_allow_html=True)
@@ -192,24 +246,12 @@ def main():
                     submitted = st.form_submit_button("Registrarse")
 
                     if submitted:
-                        usernames = config['credentials']['usernames']
-                        
                         if not all([new_username, new_email, new_name, new_password]):
                             st.error("Rellena todos los campos.")
-                        elif new_username in usernames:
+                        elif not get_user_store().register(new_username, new_email, new_name,
+                                                           hash_password(new_password)):
                             st.error("El nombre de usuario ya existe.")
                         else:
-                            config['credentials']['usernames'][new_username] = {
-                                'email': new_email,
-                                'name': new_name,
-                                'password_hash': hash_password(new_password)
-                            }
-                            if 'key' not in config['cookie']:
-                                config['cookie']['key'] = hashlib.sha256(os.urandom(32)).hexdigest()
-                                config['cookie']['name'] = 'auth_cookie'
-                                config['cookie']['expiry_days'] = 30
-                                
-                            save_config(config)
                             st.success('¡Registro exitoso! Ya puedes iniciar sesión.')
                             st.session_state['show_register'] = False
                             st.rerun()
@@ -229,8 +271,10 @@ def main():
                     submitted = st.form_submit_button("Login")
 
                     if submitted:
-                        if check_password(login_username, login_password, config):
-                            user_data = config['credentials']['usernames'][login_username]
+                        user_data = check_password(login_username, login_password)
+                        if user_data:
+                            st.session_state['auth_token'] = get_session_tokens().issue(
+                                login_username, user_data['password_hash'])
                             st.session_state['logged_in'] = True
                             st.session_state['username'] = login_username
                             st.session_state['name'] = user_data['name']
@@ -246,3 +290,4 @@ def main():
 
 if __name__ == "__main__":
     main()
+    import_profile.dump()
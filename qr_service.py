@@ -0,0 +1,114 @@
+# qr_service.py
+"""
+Servicio de renderizado de códigos QR.
+
+- Caché LRU de bytes (PNG/SVG) indexada por el hash del contenido y los parámetros.
+- La versión del QR se elige automáticamente según la longitud del contenido; para
+  URLs largas (muchas paradas) se baja la corrección de errores para no disparar el tamaño.
+- El PNG se escribe directamente desde la matriz de módulos (zlib), sin PIL.
+- Opción SVG, tampoco necesita PIL.
+
+Para un mismo símbolo, el PNG tiene los mismos píxeles que el de PIL (tests/test_qr_service.py).
+Los símbolos sí cambian respecto al antiguo QRCode(version=2) con corrección M: las URLs
+muy cortas pueden salir en versión 1 y las largas, con corrección L, en una versión menor.
+"""
+import hashlib
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+
+QR_CACHE_SIZE = 256
+DEFAULT_BOX_SIZE = 8
+DEFAULT_BORDER = 2
+# A partir de esta longitud se usa corrección de errores baja (L) en lugar de media (M)
+LONG_DATA_THRESHOLD = 300
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cache_key(data, fmt, box_size, border):
+    raw = f"{fmt}|{box_size}|{border}|{data}".encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+def _make_qr(data, border):
+    import qrcode
+    from qrcode.constants import ERROR_CORRECT_L, ERROR_CORRECT_M
+
+    correction = ERROR_CORRECT_L if len(data) > LONG_DATA_THRESHOLD else ERROR_CORRECT_M
+    # version=None + fit=True: se elige la versión mínima que admite el contenido
+    qr = qrcode.QRCode(version=None, error_correction=correction, border=border)
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr
+
+
+def _png_chunk(tag, payload):
+    return (struct.pack(">I", len(payload)) + tag + payload
+            + struct.pack(">I", zlib.crc32(tag + payload) & 0xFFFFFFFF))
+
+
+def _png_from_matrix(matrix, box_size):
+    """PNG en escala de grises de 1 bit (negro = módulo activo) a partir de la matriz del QR."""
+    size = len(matrix) * box_size
+    rows = []
+    for modules in matrix:
+        bits = "".join(("0" if m else "1") * box_size for m in modules)
+        bits += "1" * (-len(bits) % 8)
+        row = b"\x00" + int(bits, 2).to_bytes(len(bits) // 8, "big")  # filtro 0 + píxeles
+        rows.append(row * box_size)
+    header = struct.pack(">IIBBBBB", size, size, 1, 0, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n"
+            + _png_chunk(b"IHDR", header)
+            + _png_chunk(b"IDAT", zlib.compress(b"".join(rows), 6))
+            + _png_chunk(b"IEND", b""))
+
+
+def _render(data, fmt, box_size, border):
+    qr = _make_qr(data, border)
+    if fmt == "svg":
+        from qrcode.image.svg import SvgPathImage
+        return qr.make_image(image_factory=SvgPathImage).to_string()
+    return _png_from_matrix(qr.get_matrix(), box_size)
+
+
+def qr_bytes(data: str, fmt="png", box_size=DEFAULT_BOX_SIZE, border=DEFAULT_BORDER) -> bytes:
+    """Bytes del QR (PNG o SVG) para `data`, cacheados por contenido."""
+    if fmt not in ("png", "svg"):
+        raise ValueError(f"Formato de QR no soportado: {fmt}")
+    data = str(data or "")
+    key = _cache_key(data, fmt, box_size, border)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    out = _render(data, fmt, box_size, border)
+
+    with _cache_lock:
+        _cache[key] = out
+        _cache.move_to_end(key)
+        while len(_cache) > QR_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return out
+
+
+def qr_png(data: str, box_size=DEFAULT_BOX_SIZE, border=DEFAULT_BORDER) -> bytes:
+    return qr_bytes(data, "png", box_size, border)
+
+
+def qr_svg(data: str, border=DEFAULT_BORDER) -> bytes:
+    return qr_bytes(data, "svg", border=border)
+
+
+def qr_batch(items, fmt="png", box_size=DEFAULT_BOX_SIZE, border=DEFAULT_BORDER):
+    """QR de varios contenidos (p. ej. un tramo por URL), en el mismo orden; los repetidos se renderizan una vez."""
+    rendered = {}
+    out = []
+    for data in items:
+        if data not in rendered:
+            rendered[data] = qr_bytes(data, fmt, box_size, border)
+        out.append(rendered[data])
+    return out
@@ -0,0 +1,413 @@
+# route_api.py
+"""
+API HTTP/JSON local para generar rutas sin el modelo de reruns de Streamlit.
+
+Servidor de la librería estándar con HTTP/1.1 keep-alive y un pool de hilos acotado.
+Los hilos del pool solo atienden peticiones: entre una y otra, las conexiones keep-alive
+esperan en un selector, así que los clientes inactivos no bloquean a los nuevos.
+Endpoints:
+  GET  /health    estado del servicio y de la clave de Google
+  GET  /metrics   métricas de geocodificación (texto de Prometheus)
+  POST /resolve   {"labels": [...]}                                 -> {"results": [meta, ...]}
+  POST /optimize  {"points": [[lat, lon], ...]} o {"labels": [...]},
+                  "fixed_end": true                                  -> {"order", "before_km", "after_km"}
+  POST /links     {"labels": [...]} o {"metas": [...]}, "optimize", "mode", "route_type",
+                  "stop_minutes", "qr"
+                                                                     -> {"legs": [...], "metrics": {...}}
+  POST /suggest   {"query": "carrer maj", "limit": 5, "user": "..."} -> {"suggestions": [...]}
+
+Uso:
+    python route_api.py --port 8502 --workers 16
+    python route_api.py --stub-geocoder      # geocodificador simulado, sin red ni clave
+"""
+import argparse
+import base64
+import hashlib
+import json
+import math
+import os
+import selectors
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import app_utils_core
+from app_utils_core import build_route_legs, resolve_many, suggest_addresses
+from qr_service import qr_batch
+from route_optimizer import optimize_coords
+from travel_time import DEFAULT_MODE, DEFAULT_ROUTE_TYPE, MODE_PROFILES, ROUTE_TYPES, estimate_route
+
+MAX_BODY_BYTES = 1 << 20  # 1 MB
+# Puntos por petición, como el límite de la pestaña profesional: la matriz de distancias
+# crece con n² y 1 MB de cuerpo cabe en ~100k puntos
+MAX_POINTS = int(os.getenv("ROUTE_API_MAX_POINTS", "200"))
+# Orígenes (separados por comas) que pueden llamar a la API desde el navegador: por
+# defecto solo la app de Streamlit local que sirve autocomplete.html. "*" lo abre a
+# cualquier web, que podría lanzar geocodificaciones de pago con el navegador del usuario.
+CORS_ORIGINS = frozenset(
+    o.strip().rstrip("/")
+    for o in os.getenv("ROUTE_API_CORS_ORIGIN", "http://localhost:8501,http://127.0.0.1:8501").split(",")
+    if o.strip()
+)
+KEEP_ALIVE_TIMEOUT = 15   # segundos de inactividad antes de cerrar una conexión
+_IDLE_SWEEP = 0.5         # cada cuánto se revisan las conexiones inactivas caducadas
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class StubGeocoder:
+    """Geocodificador determinista y sin red (coordenadas en torno a Girona) para pruebas locales."""
+
+    def geocode(self, query):
+        digest = hashlib.sha256(str(query).lower().encode("utf-8")).digest()
+        lat = 41.9 + int.from_bytes(digest[:4], "big") / 2**32 * 0.2
+        lng = 2.7 + int.from_bytes(digest[4:8], "big") / 2**32 * 0.2
+        return [{
+            "geometry": {"location": {"lat": lat, "lng": lng}},
+            "formatted_address": str(query).strip().title(),
+            "place_id": "stub-" + digest[:8].hex(),
+        }]
+
+
+# ---------------------------
+# Lógica de los endpoints
+# ---------------------------
+def _check_size(items, field):
+    if len(items) > MAX_POINTS:
+        raise ApiError(400, f"'{field}' admite como mucho {MAX_POINTS} puntos")
+
+
+def _labels(body):
+    labels = body.get("labels")
+    if not isinstance(labels, list) or not all(isinstance(x, str) for x in labels):
+        raise ApiError(400, "'labels' debe ser una lista de textos")
+    _check_size(labels, "labels")
+    return labels
+
+
+def _metas(body):
+    if "metas" in body:
+        metas = body["metas"]
+        if not isinstance(metas, list) or not all(isinstance(m, dict) for m in metas):
+            raise ApiError(400, "'metas' debe ser una lista de objetos")
+        _check_size(metas, "metas")
+        return metas
+    return resolve_many(_labels(body))
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _valid_coord(lat, lon):
+    """Números finitos dentro de rango (NaN o infinito darían un JSON de salida inválido)."""
+    return _is_number(lat) and _is_number(lon) and -90 <= lat <= 90 and -180 <= lon <= 180
+
+
+def _coords(metas):
+    coords = [(m.get("lat"), m.get("lon")) for m in metas]
+    if any(lat is None or lon is None for lat, lon in coords):
+        return None
+    if not all(_valid_coord(lat, lon) for lat, lon in coords):
+        raise ApiError(400, "'lat' y 'lon' de 'metas' deben ser números dentro de rango")
+    return coords
+
+
+def handle_resolve(body, client=None):
+    return {"results": resolve_many(_labels(body))}
+
+
+def handle_optimize(body, client=None):
+    if "points" in body:
+        try:
+            coords = [(float(lat), float(lon)) for lat, lon in body["points"]]
+        except (TypeError, ValueError):
+            raise ApiError(400, "'points' debe ser una lista de pares [lat, lon]")
+        _check_size(coords, "points")
+        if not all(_valid_coord(lat, lon) for lat, lon in coords):
+            raise ApiError(400, "'points' debe tener latitudes entre -90 y 90 y longitudes entre -180 y 180")
+    else:
+        coords = _coords(_metas(body))
+        if coords is None:
+            raise ApiError(422, "Alguna dirección no se pudo geocodificar")
+    return optimize_coords(coords, fixed_end=bool(body.get("fixed_end", True)))
+
+
+def handle_links(body, client=None):
+    optimize = bool(body.get("optimize", False))
+    mode = str(body.get("mode") or DEFAULT_MODE)
+    route_type = str(body.get("route_type") or DEFAULT_ROUTE_TYPE)
+    if mode not in MODE_PROFILES:
+        raise ApiError(400, f"'mode' debe ser uno de: {', '.join(MODE_PROFILES)}")
+    if route_type not in ROUTE_TYPES:
+        raise ApiError(400, f"'route_type' debe ser uno de: {', '.join(ROUTE_TYPES)}")
+    try:
+        stop_minutes = max(0.0, float(body.get("stop_minutes") or 0))
+    except (TypeError, ValueError):
+        raise ApiError(400, "'stop_minutes' debe ser un número")
+    metas = _metas(body)
+    if len(metas) < 2:
+        raise ApiError(400, "Se necesitan al menos 2 puntos")
+
+    result = {}
+    coords = _coords(metas)
+    if optimize and coords:
+        opt = optimize_coords(coords)
+        metas = [metas[i] for i in opt["order"]]
+        coords = [coords[i] for i in opt["order"]]
+        result["optimization"] = opt
+        optimize = False  # ya optimizado localmente
+
+    legs = build_route_legs(metas, mode=mode, optimize=optimize)
+    if body.get("qr"):
+        for leg, png in zip(legs, qr_batch([leg["gmaps"] for leg in legs])):
+            leg["qr_png_base64"] = base64.b64encode(png).decode("ascii")
+    result["legs"] = legs
+    result["metrics"] = estimate_route(coords, mode, route_type, stop_minutes) if coords else None
+    return result
+
+
+def handle_suggest(body, client=None):
+    query = body.get("query")
+    if not isinstance(query, str):
+        raise ApiError(400, "'query' debe ser un texto")
+    user = body.get("user")
+    if user is not None and not isinstance(user, str):
+        raise ApiError(400, "'user' debe ser un texto")
+    try:
+        limit = max(1, min(20, int(body.get("limit", 5))))
+    except (TypeError, ValueError):
+        raise ApiError(400, "'limit' debe ser un entero")
+    # El debounce va por cliente: dos clientes anónimos no se cancelan las búsquedas
+    return {"suggestions": suggest_addresses(query, limit=limit, user=user or None, client=client)}
+
+
+ROUTES = {
+    "/resolve": handle_resolve,
+    "/optimize": handle_optimize,
+    "/links": handle_links,
+    "/suggest": handle_suggest,
+}
+
+
+# ---------------------------
+# Servidor
+# ---------------------------
+class RouteAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    timeout = KEEP_ALIVE_TIMEOUT
+    # Cabeceras y cuerpo salen en escrituras separadas: sin TCP_NODELAY, Nagle + ACK
+    # retardado añaden ~40 ms a cada respuesta en conexiones keep-alive.
+    disable_nagle_algorithm = True
+    quiet = True
+
+    def handle(self):
+        # Atiende las peticiones ya recibidas; si la conexión sigue abierta pero no ha
+        # llegado la siguiente, la devuelve al selector del servidor y libera el hilo
+        self.keep_alive = False
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection:
+            if not self._request_pending():
+                self.keep_alive = True
+                return
+            self.handle_one_request()
+
+    def _request_pending(self):
+        """¿Hay ya bytes de otra petición (pipelining) en el búfer o en el socket?"""
+        self.connection.settimeout(0)
+        try:
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            self.connection.settimeout(self.timeout)
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload):
+        self._send(status, json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8")
+
+    def _allowed_origin(self):
+        """Origen del navegador si está permitido; None si no lo está o no hay (curl, scripts)."""
+        origin = self.headers.get("Origin")
+        if origin and ("*" in CORS_ORIGINS or origin.rstrip("/") in CORS_ORIGINS):
+            return origin
+        return None
+
+    def _send_cors_headers(self):
+        origin = self._allowed_origin()
+        if origin:
+            self.send_header("Access-Control-Allow-Origin", origin)
+            self.send_header("Vary", "Origin")
+
+    def _send(self, status, data, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self._send_cors_headers()
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_OPTIONS(self):
+        # Preflight CORS de las peticiones JSON del navegador
+        self.send_response(204)
+        if self._allowed_origin():
+            self._send_cors_headers()
+            self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+            self.send_header("Access-Control-Allow-Headers", "Content-Type")
+            self.send_header("Access-Control-Max-Age", "86400")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", "gmaps": app_utils_core.client_health()})
+        elif self.path == "/metrics":
+            self._send(200, app_utils_core.geocode_metrics_text().encode("utf-8"), "text/plain; version=0.0.4")
+        else:
+            self._send_json(404, {"error": "No encontrado"})
+
+    def do_POST(self):
+        handler = ROUTES.get(self.path)
+        try:
+            # Un POST "simple" (text/plain) no pasa por el preflight: desde otra web se rechaza
+            # antes de hacer nada, para que no pueda gastar cuota aunque no lea la respuesta
+            if self.headers.get("Origin") and not self._allowed_origin():
+                raise ApiError(403, "Origen no permitido")
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_BODY_BYTES:
+                raise ApiError(413, "Petición demasiado grande")
+            raw = self.rfile.read(length) if length else b"{}"
+            if handler is None:
+                raise ApiError(404, "No encontrado")
+            try:
+                body = json.loads(raw or b"{}")
+            except ValueError:
+                raise ApiError(400, "JSON inválido")
+            if not isinstance(body, dict):
+                raise ApiError(400, "Se esperaba un objeto JSON")
+            self._send_json(200, handler(body, self.client_address[0]))
+        except ApiError as e:
+            self._send_json(e.status, {"error": str(e)})
+        except Exception as e:
+            print(f"Error en {self.path}: {e}", file=sys.stderr)
+            self._send_json(500, {"error": "Error interno"})
+
+
+class RouteAPIServer(ThreadingHTTPServer):
+    """
+    Como ThreadingHTTPServer, pero con un pool de hilos acotado que solo atiende peticiones:
+    las conexiones keep-alive inactivas esperan en un selector (un hilo para todas) y
+    vuelven al pool cuando llega su siguiente petición.
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, server_address, handler_class=RouteAPIHandler, workers=16):
+        super().__init__(server_address, handler_class)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="route-api")
+        self._idle = {}   # socket -> (dirección del cliente, inactivo desde)
+        self._idle_lock = threading.Lock()
+        self._selector = selectors.DefaultSelector()
+        self._closing = False
+        self._watcher = threading.Thread(target=self._watch_idle, name="route-api-idle", daemon=True)
+        self._watcher.start()
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._serve_connection, request, client_address)
+
+    def _serve_connection(self, request, client_address):
+        try:
+            handler = self.RequestHandlerClass(request, client_address, self)
+        except Exception:
+            self.handle_error(request, client_address)
+            self.shutdown_request(request)
+            return
+        if handler.keep_alive and not self._closing:
+            self._park(request, client_address)
+        else:
+            self.shutdown_request(request)
+
+    def _park(self, request, client_address):
+        with self._idle_lock:
+            self._idle[request] = (client_address, time.monotonic())
+            self._selector.register(request, selectors.EVENT_READ)
+
+    def _watch_idle(self):
+        """Devuelve al pool las conexiones con una petición nueva y cierra las caducadas."""
+        while not self._closing:
+            try:
+                events = self._selector.select(timeout=_IDLE_SWEEP)
+            except OSError:
+                return  # selector cerrado
+            now = time.monotonic()
+            ready, expired = [], []
+            with self._idle_lock:
+                for key, _ in events:
+                    if key.fileobj in self._idle:
+                        self._selector.unregister(key.fileobj)
+                        ready.append((key.fileobj, self._idle.pop(key.fileobj)[0]))
+                for sock, (_, since) in list(self._idle.items()):
+                    if now - since >= KEEP_ALIVE_TIMEOUT:
+                        self._selector.unregister(sock)
+                        del self._idle[sock]
+                        expired.append(sock)
+            for sock, client_address in ready:
+                self._pool.submit(self._serve_connection, sock, client_address)
+            for sock in expired:
+                self.shutdown_request(sock)
+
+    def server_close(self):
+        super().server_close()
+        self._closing = True
+        with self._idle_lock:
+            idle, self._idle = list(self._idle), {}
+            for sock in idle:
+                self._selector.unregister(sock)
+        for sock in idle:
+            self.shutdown_request(sock)
+        self._watcher.join(timeout=2 * _IDLE_SWEEP)
+        self._selector.close()
+        self._pool.shutdown(wait=False)
+
+
+def make_server(host="127.0.0.1", port=8502, workers=16, geocoder=None):
+    """Crea el servidor; `geocoder` sustituye al cliente de Google (p. ej. StubGeocoder())."""
+    if geocoder is not None:
+        app_utils_core.set_gmaps_client(geocoder)
+    return RouteAPIServer((host, port), RouteAPIHandler, workers=workers)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--workers", type=int, default=16, help="Peticiones atendidas a la vez (las conexiones inactivas no ocupan hilo)")
+    parser.add_argument("--stub-geocoder", action="store_true", help="Usar un geocodificador simulado sin red")
+    parser.add_argument("--verbose", action="store_true", help="Registrar cada petición")
+    args = parser.parse_args(argv)
+
+    RouteAPIHandler.quiet = not args.verbose
+    server = make_server(args.host, args.port, args.workers, StubGeocoder() if args.stub_geocoder else None)
+    print(f"API de rutas escuchando en http://{args.host}:{args.port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+# route_store.py
+"""
+Almacén de rutas guardadas sobre SQLite (modo WAL).
+
+Una fila por ruta, con clave primaria (usuario, nombre): guardar o borrar una ruta
+es una única sentencia atómica, sin reescribir el resto de rutas del usuario, y
+varias sesiones del mismo usuario pueden escribir a la vez sin perder cambios.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# Edad máxima de los metadatos guardados con cada parada antes de volver a geocodificar
+STOP_META_MAX_AGE = int(os.getenv("STOP_META_MAX_AGE", str(30 * 24 * 3600)))  # 30 días
+STOP_META_FIELDS = ("address", "lat", "lon", "place_id", "resolved_at")
+
+ROUTES_DIR = Path(".streamlit")
+ROUTES_DB_PATH = Path(os.getenv("ROUTES_DB_PATH", str(ROUTES_DIR / "routes.sqlite3")))
+LEGACY_PATTERN = "routes_*.json"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS routes (
+    user       TEXT NOT NULL,
+    name       TEXT NOT NULL,
+    points     TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (user, name)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS imported_files (
+    path        TEXT PRIMARY KEY,
+    imported_at REAL NOT NULL
+);
+"""
+
+
+# ---------------------------
+# Formato de paradas
+# ---------------------------
+# Formato antiguo: cada parada es el texto tal cual lo escribió el usuario.
+# Formato actual: {"label": texto, "address", "lat", "lon", "place_id", "resolved_at"}.
+
+def stop_record(label, meta=None) -> dict:
+    """Parada serializable: el texto original más los metadatos resueltos (si los hay)."""
+    record = {"label": label}
+    if meta and meta.get("lat") is not None and meta.get("lon") is not None:
+        record.update({k: meta[k] for k in STOP_META_FIELDS if meta.get(k) is not None})
+    return record
+
+
+def parse_stop(item):
+    """(texto, metadatos o None) de una parada en cualquiera de los dos formatos."""
+    if isinstance(item, dict):
+        label = str(item.get("label") or item.get("address") or "").strip()
+        if item.get("lat") is None or item.get("lon") is None:
+            return label, None
+        meta = {k: item[k] for k in STOP_META_FIELDS if k in item}
+        meta.setdefault("address", label)
+        meta["coords"] = f"{meta['lat']},{meta['lon']}"
+        return label, meta
+    return str(item or "").strip(), None
+
+
+def is_fresh(meta, max_age=STOP_META_MAX_AGE, now=None) -> bool:
+    """True si los metadatos tienen coordenadas y se resolvieron hace menos de `max_age` segundos."""
+    if not meta or meta.get("lat") is None or meta.get("lon") is None:
+        return False
+    resolved_at = meta.get("resolved_at")
+    if resolved_at is None:
+        return False
+    return ((now or time.time()) - resolved_at) < max_age
+
+
+class RouteStore:
+    """Rutas por usuario: {nombre: [paradas...]} (ver stop_record / parse_stop)."""
+
+    def __init__(self, path=ROUTES_DB_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Una conexión por proceso protegida con un lock; WAL permite lectores concurrentes
+        # de otros procesos mientras se escribe.
+        self._db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def load_routes(self, user) -> dict:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT name, points FROM routes WHERE user = ? ORDER BY name", (user,)
+            ).fetchall()
+        return {name: json.loads(points) for name, points in rows}
+
+    def save_route(self, user, name, points):
+        """Crea o sobrescribe una ruta (upsert de una sola fila)."""
+        payload = json.dumps(list(points), ensure_ascii=False)
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO routes (user, name, points, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(user, name) DO UPDATE SET points = excluded.points, updated_at = excluded.updated_at",
+                (user, name, payload, time.time()),
+            )
+
+    def delete_route(self, user, name) -> bool:
+        with self._lock:
+            cur = self._db.execute("DELETE FROM routes WHERE user = ? AND name = ?", (user, name))
+        return cur.rowcount > 0
+
+    def migrate_json_files(self, routes_dir=ROUTES_DIR, pattern=LEGACY_PATTERN) -> int:
+        """
+        Importa los antiguos .streamlit/routes_{usuario}.json una sola vez por fichero.
+        No pisa rutas que ya existan en la base de datos. Devuelve el número de rutas importadas.
+        """
+        imported = 0
+        for path in sorted(Path(routes_dir).glob(pattern)):
+            user = path.stem[len("routes_"):]
+            key = str(path.resolve())
+            with self._lock:
+                done = self._db.execute("SELECT 1 FROM imported_files WHERE path = ?", (key,)).fetchone()
+            if done or not user:
+                continue
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                print(f"No se pudo migrar {path}: {e}")
+                continue
+            if data is None:
+                data = {}
+            if not isinstance(data, dict):
+                print(f"No se pudo migrar {path}: se esperaba un objeto {{nombre: paradas}}")
+                continue
+            now = time.time()
+            with self._lock:
+                self._db.execute("BEGIN IMMEDIATE")
+                try:
+                    # Otro proceso puede haberlo importado mientras leíamos el fichero: se vuelve
+                    # a comprobar dentro de la transacción, que ya tiene el lock de escritura
+                    if self._db.execute("SELECT 1 FROM imported_files WHERE path = ?", (key,)).fetchone():
+                        self._db.execute("ROLLBACK")
+                        continue
+                    for name, points in data.items():
+                        cur = self._db.execute(
+                            "INSERT OR IGNORE INTO routes (user, name, points, updated_at) VALUES (?, ?, ?, ?)",
+                            (user, name, json.dumps(points, ensure_ascii=False), now),
+                        )
+                        imported += cur.rowcount
+                    self._db.execute("INSERT INTO imported_files (path, imported_at) VALUES (?, ?)", (key, now))
+                    self._db.execute("COMMIT")
+                except Exception:
+                    # La conexión es compartida: una transacción abierta dejaría sin confirmar
+                    # las escrituras de todas las sesiones
+                    self._db.execute("ROLLBACK")
+                    raise
+        return imported
@@ -1,2 +1,28 @@
-import sys, importlib
-sys.modules['app_utils'] = importlib.import_module('app_utils_core')
+# sitecustomize.py
+# "app_utils" es un alias de app_utils_core. El módulo se carga de forma perezosa
+# (importlib.util.LazyLoader): arrancar Python en este directorio ya no importa
+# streamlit ni googlemaps hasta que alguien usa de verdad un atributo del módulo.
+import importlib.util
+import os
+import sys
+
+if os.environ.get("IMPORT_PROFILE"):
+    import import_profile
+    import_profile.install()
+
+
+def _lazy_module(name):
+    spec = importlib.util.find_spec(name)
+    if spec is None or spec.loader is None:
+        return None
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+if "app_utils" not in sys.modules:
+    _module = sys.modules.get("app_utils_core") or _lazy_module("app_utils_core")
+    if _module is not None:
+        sys.modules["app_utils"] = _module
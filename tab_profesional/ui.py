@@ -1,54 +1,79 @@
+import datetime
 import io
-import json
-from pathlib import Path
 from typing import List
 
 import streamlit as st
-import qrcode
 
 from app_utils_core import (
-    build_gmaps_web_url, 
-    build_waze_url, 
-    build_apple_maps_url,
-    resolve_selection,
+    LEG_MAX_POINTS,
+    build_route_legs,
+    canonical_key,
+    clean_label,
+    resolve_many,
+    set_user_addresses,
+    track_usage,
 )
+from route_optimizer import optimize_coords
+from i18n import texts
+from qr_service import qr_batch, qr_png
+from route_store import RouteStore, is_fresh, parse_stop, stop_record
+from stop_import import rows_from_file, rows_from_text
+from travel_time import DEFAULT_MODE, MODE_PROFILES, ROUTE_TYPES, estimate_route
 
-# Definición base para la carpeta de rutas
-ROUTES_DIR = Path(".streamlit")
-ROUTES_DIR.mkdir(parents=True, exist_ok=True)
-
-MAX_POINTS = 10
+# Las rutas largas se dividen en tramos (ver build_route_legs), así que el límite
+# ya no lo impone el formato de URL de Google; solo protege la interfaz.
+MAX_POINTS = 200
 
 
 # ---------------------------
 # Estado
 # ---------------------------
-def _get_user_routes_path():
-    """Devuelve el objeto Path del archivo de rutas del usuario logeado."""
-    username = st.session_state.get('username', 'default')
-    return ROUTES_DIR / f"routes_{username}.json"
+@st.cache_resource
+def get_route_store():
+    """Almacén SQLite compartido por todas las sesiones; importa una vez los antiguos routes_*.json."""
+    store = RouteStore()
+    try:
+        store.migrate_json_files()
+    except Exception as e:
+        print(f"Error migrando rutas JSON: {e}")
+    return store
+
+
+def _current_user():
+    return st.session_state.get('username') or 'default'
+
 
 def _load_routes_file():
-    """Carga las rutas del archivo específico del usuario."""
-    routes_db_path = _get_user_routes_path()
+    """Carga las rutas guardadas del usuario logeado (y alimenta sus sugerencias de direcciones)."""
     try:
-        if routes_db_path.exists():
-            return json.loads(routes_db_path.read_text(encoding="utf-8"))
-    except Exception:
-        pass
-    return {}
+        routes = get_route_store().load_routes(_current_user())
+        set_user_addresses(_current_user(), {parse_stop(p)[0] for pts in routes.values() for p in pts})
+        return routes
+    except Exception as e:
+        print(f"Error cargando rutas: {e}")
+        return {}
 
 
-def _persist_routes_file():
-    """Guarda las rutas en el archivo específico del usuario."""
-    routes_db_path = _get_user_routes_path()
+def _persist_route(name: str):
+    """Guarda (upsert) solo la ruta `name` y refresca la lista con lo que haya en el almacén."""
+    ss = st.session_state
     try:
-        routes_db_path.write_text(
-            json.dumps(st.session_state["saved_routes"], ensure_ascii=False, indent=2),
-            encoding="utf-8",
-        )
-    except Exception:
-        pass
+        store = get_route_store()
+        store.save_route(_current_user(), name, ss["saved_routes"][name])
+        ss["saved_routes"] = _load_routes_file()
+    except Exception as e:
+        print(f"Error guardando ruta {name}: {e}")
+
+
+def _forget_route(name: str):
+    """Borra la ruta `name` del almacén y refresca la lista."""
+    ss = st.session_state
+    try:
+        store = get_route_store()
+        store.delete_route(_current_user(), name)
+        ss["saved_routes"] = _load_routes_file()
+    except Exception as e:
+        print(f"Error borrando ruta {name}: {e}")
 
 
 def _bump_list_version():
@@ -60,11 +85,11 @@ def _bump_list_version():
 # ---------------------------
 def _add_point(val: str):
     ss = st.session_state
-    val = (val or "").strip()
+    val = clean_label(val)
     if not val:
         return
     if len(ss["prof_points"]) >= MAX_POINTS:
-        st.warning(f"Límite de {MAX_POINTS} puntos.")
+        st.warning(texts()("point_limit", n=MAX_POINTS))
         return
     ss["prof_points"].append(val)
     
@@ -77,14 +102,58 @@ def _add_point(val: str):
     st.rerun()
 
 
+def _import_stops(rows):
+    """
+    Añade en bloque las filas [(n.º de fila, texto)]: descarta duplicadas (por clave canónica),
+    geocodifica todas de una vez con barra de progreso y deja un informe por fila.
+    """
+    ss = st.session_state
+    T = texts()
+    errors = []
+    existing = {canonical_key(p) for p in ss["prof_points"]}
+    accepted = []
+    for n, text in rows:
+        if not text:
+            continue
+        key = canonical_key(text)
+        if key in existing:
+            errors.append({"row": n, "text": text, "reason": T("import_duplicate")})
+            continue
+        existing.add(key)
+        accepted.append((n, text))
+
+    room = MAX_POINTS - len(ss["prof_points"])
+    for n, text in accepted[max(room, 0):]:
+        errors.append({"row": n, "text": text, "reason": T("import_over_limit", n=MAX_POINTS)})
+    accepted = accepted[:max(room, 0)]
+
+    if accepted:
+        bar = st.progress(0.0, text=T("geocoding_n", n=len(accepted)))
+        metas = resolve_many(
+            [text for _, text in accepted],
+            progress=lambda done, total: bar.progress(done / total, text=T("geocoding_progress", done=done, total=total)),
+        )
+        point_meta = ss.setdefault("point_meta", {})
+        for (n, text), meta in zip(accepted, metas):
+            ss["prof_points"].append(text)
+            if meta.get("lat") is not None:
+                point_meta[text] = meta
+            else:
+                # Se añade igualmente: los enlaces usarán el texto tal cual
+                errors.append({"row": n, "text": text, "reason": meta.get("error") or T("import_no_coords")})
+        _bump_list_version()
+
+    ss["import_report"] = {"added": len(accepted), "errors": sorted(errors, key=lambda e: e["row"])}
+    st.rerun()
+
+
 def _clear_points():
     ss = st.session_state
     ss["prof_points"] = []
-    ss["last_gmaps_url"] = None
+    ss["resolved_route"] = None
     if "prof_text_input" in ss:
         del ss["prof_text_input"]
     _bump_list_version()
-    st.rerun()
 
 
 def _move_point_up(i: int):
@@ -92,7 +161,6 @@ def _move_point_up(i: int):
     if i > 0:
         pts[i-1], pts[i] = pts[i], pts[i-1]
         _bump_list_version()
-    st.rerun()
 
 
 def _move_point_down(i: int):
@@ -100,7 +168,6 @@ def _move_point_down(i: int):
     if i < len(pts) - 1:
         pts[i+1], pts[i] = pts[i], pts[i+1]
         _bump_list_version()
-    st.rerun()
 
 
 def _delete_point(i: int):
@@ -108,7 +175,6 @@ def _delete_point(i: int):
     if 0 <= i < len(pts):
         pts.pop(i)
         _bump_list_version()
-    st.rerun()
 
 
 # ---------------------------
@@ -118,10 +184,10 @@ def _save_current_route():
     ss = st.session_state
     name = (ss.get("route_name_input") or "").strip()
     if not name:
-        st.warning("Pon un nombre para guardar la ruta.")
+        st.warning(texts()("save_need_name"))
         return
     if len(ss["prof_points"]) < 1:
-        st.warning("No hay puntos para guardar.")
+        st.warning(texts()("save_no_points"))
         return
 
     if name in ss["saved_routes"] and ss.get("ow_pending") != name:
@@ -129,11 +195,11 @@ def _save_current_route():
         st.rerun()
         return
 
-    ss["saved_routes"][name] = list(ss["prof_points"])
-    _persist_routes_file()
+    ss["saved_routes"][name] = _route_records()
+    _persist_route(name)
     ss["saved_choice"] = name
     ss["ow_pending"] = None
-    st.success("Ruta guardada ✅")
+    st.success(texts()("route_saved"))
     
     # === CORRECCIÓN 3: LIMPIAR CAMPO DE RUTA GUARDADA DESPUÉS DE GUARDAR ===
     if "route_name_input" in ss:
@@ -147,10 +213,10 @@ def _confirm_overwrite(ok: bool):
     if not name:
         return
     if ok:
-        ss["saved_routes"][name] = list(ss["prof_points"])
-        _persist_routes_file()
+        ss["saved_routes"][name] = _route_records()
+        _persist_route(name)
         ss["saved_choice"] = name
-        st.success("Ruta sobrescrita ✅")
+        st.success(texts()("route_overwritten"))
     ss["ow_pending"] = None
     st.rerun()
 
@@ -164,11 +230,16 @@ def _load_route(name: str):
         return
     
     # === CORRECCIÓN DE LIMPIEZA ===
+    # Admite el formato antiguo (solo texto) y el actual (texto + coordenadas ya resueltas)
     cleaned_data = []
+    point_meta = ss.setdefault("point_meta", {})
     for item in data:
-        s = str(item).strip()
-        if s: 
-            cleaned_data.append(s)
+        label, meta = parse_stop(item)
+        label = clean_label(label)
+        if label:
+            cleaned_data.append(label)
+            if meta is not None:
+                point_meta[label] = meta
             
     ss["prof_points"] = cleaned_data
     # ==============================
@@ -187,9 +258,9 @@ def _delete_saved_route(name: str):
     ss = st.session_state
     if name and name in ss["saved_routes"]:
         del ss["saved_routes"][name]
-        _persist_routes_file()
+        _forget_route(name)
         ss["saved_choice"] = "" # Limpiamos el selectbox
-        st.success("Ruta borrada 🗑️")
+        st.success(texts()("route_deleted"))
         st.rerun()
 
 
@@ -198,15 +269,8 @@ def _delete_saved_route(name: str):
 # ---------------------------
 # === CORRECCIÓN 2: Código QR para Streamlit ===
 def _qr_image_for(url: str):
-    # Asegúrate de que qrcode, io están importados
-    qr = qrcode.QRCode(version=2, box_size=8, border=2)
-    qr.add_data(url)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
-    buf = io.BytesIO()
-    img.save(buf, format="PNG")
-    buf.seek(0)
-    return buf
+    # PNG cacheado por contenido (ver qr_service): en los reruns no se vuelve a renderizar
+    return io.BytesIO(qr_png(url))
 # ===========================================
 
 
@@ -214,71 +278,113 @@ def _qr_image_for(url: str):
 # Componentes de diseño (Estilo Retool)
 # ---------------------------
 
+def _leg_links(leg):
+    """Botones y QR de un tramo ya generado (sin ninguna llamada de red)."""
+    T = texts()
+    i = leg["index"]
+    st.link_button(T("open_gmaps"), leg["gmaps"], type="primary", use_container_width=True)
+    st.link_button(T("open_waze"), leg["waze"], use_container_width=True)
+    st.link_button(T("open_apple"), leg["apple"], use_container_width=True)
+    st.link_button(T("copy_link"), leg["gmaps"], help=T("copy_link_help"), use_container_width=True)
+
+    st.markdown("---")
+    st.caption(T("scan_qr_gmaps"))
+    st.image(leg["qr"], caption=T("qr_leg", i=i + 1), width=150)
+
+
 def _add_direction_container():
-    st.subheader("Agregar Dirección")
+    T = texts()
+    st.subheader(T("add_header"))
     with st.form("add_form", clear_on_submit=False):
         st.text_input(
-            "Dirección",
+            T("address_label"),
             key="prof_text_input",
-            placeholder="Ingrese una dirección...",
+            placeholder=T("address_ph"),
             label_visibility="visible"
         )
         st.checkbox(
-            "Optimizar ruta",
+            T("optimize_route"),
             value=st.session_state.get("optimize_route", False),
             key="optimize_route",
         )
-        submitted = st.form_submit_button("Agregar", type="primary", use_container_width=True)
+        submitted = st.form_submit_button(T("add_button"), type="primary", use_container_width=True)
     if submitted:
         _add_point(st.session_state.get("prof_text_input"))
+    _bulk_import_container()
+
+
+def _bulk_import_container():
+    """Importación en bloque: texto pegado o fichero CSV/TXT/XLSX (un solo rerun para todas las paradas)."""
+    ss = st.session_state
+    T = texts()
+    report = ss.pop("import_report", None)
+    with st.expander(T("import_header"), expanded=report is not None):
+        with st.form("import_form", clear_on_submit=True):
+            pasted = st.text_area(T("import_paste"), height=120, key="import_text")
+            upload = st.file_uploader(T("import_upload"), type=["csv", "txt", "xlsx"], key="import_file")
+            submitted = st.form_submit_button(T("import_button"), use_container_width=True)
+        if submitted:
+            try:
+                rows = rows_from_text(pasted)
+                if upload is not None:
+                    rows += rows_from_file(upload.name, upload.getvalue())
+            except ValueError as e:
+                st.error(str(e))
+                return
+            _import_stops(rows)
+        if report is not None:
+            st.success(T("import_added", n=report["added"]))
+            if report["errors"]:
+                st.warning(T("import_issues", n=len(report["errors"])))
+                st.dataframe(
+                    report["errors"], hide_index=True, use_container_width=True,
+                    column_config={"row": T("import_col_row"), "text": T("import_col_text"), "reason": T("import_col_reason")},
+                )
 
 
+_MD_SPECIAL = str.maketrans({ch: "\\" + ch for ch in "\\`*_{}[]<>()#+-.!|~$"})
+
+
+@st.fragment
 def _list_col():
+    """
+    Lista de puntos como fragmento: ▲/▼/✖ solo vuelven a ejecutar este bloque, no la página.
+    Si el panel de exportación mostraba enlaces de la lista anterior, se fuerza una sola
+    ejecución completa para que pase a «la lista ha cambiado».
+    """
     ss = st.session_state
-    
+    # export_version solo queda fijado entre ejecuciones completas (ver mostrar_profesional)
+    shown = ss.get("export_version")
+    if shown is not None and shown != ss.get("list_version", 0):
+        st.rerun(scope="app")
+
     pts: List[str] = ss.get("prof_points", [])
     if not pts:
-        st.info("Añade al menos dos puntos (origen y destino).")
+        st.info(texts()("list_empty"))
     else:
-        ver = ss.get("list_version", 0)
+        # Una fila = un contenedor horizontal con texto y tres botones. Antes era un text_input
+        # deshabilitado (cada widget con clave recorre todo session_state) dentro de columnas
+        # anidadas: ~4x menos trabajo por rerun con 50 paradas.
+        # Claves por posición: al reordenar se reutilizan los mismos botones.
+        last = len(pts) - 1
         for i, p in enumerate(pts):
-            # Usamos las columnas [Indice, Campo, Botones]
-            row = st.columns([1, 8, 3]) 
-            
-            with row[0]:
-                st.markdown(f"**{i+1}.**") # Añadimos el índice
-            
-            with row[1]:
-                st.text_input(
-                    f"Punto {i+1}: {p}",
-                    value=str(p) if p is not None else "",
-                    key=f"pt_{ver}_{i}",
-                    disabled=True,
-                    label_visibility="collapsed",
-                )
-            
-            with row[2]:
-                col_btn = st.columns(3)  
-                
-                with col_btn[0]:
-                    st.button("✖", key=f"del_{ver}_{i}", on_click=_delete_point, args=(i,), use_container_width=True)
-                with col_btn[1]:
-                    st.button("▲", key=f"up_{ver}_{i}", on_click=_move_point_up, args=(i,), use_container_width=True,
-                              disabled=(i==0))
-                with col_btn[2]:
-                    st.button("▼", key=f"dn_{ver}_{i}", on_click=_move_point_down, args=(i,), use_container_width=True,
-                              disabled=(i==len(pts)-1))
+            row = st.container(horizontal=True, vertical_alignment="center")
+            row.markdown(f"**{i+1}.** {str(p or '').translate(_MD_SPECIAL)}", width="stretch")
+            row.button("✖", key=f"del_{i}", on_click=_delete_point, args=(i,))
+            row.button("▲", key=f"up_{i}", on_click=_move_point_up, args=(i,), disabled=(i == 0))
+            row.button("▼", key=f"dn_{i}", on_click=_move_point_down, args=(i,), disabled=(i == last))
 
 
 def _save_load_col():
     ss = st.session_state
+    T = texts()
     
     # Campo de NOMBRE para guardar o SOBREESCRIBIR
-    st.text_input("Nombre de ruta", key="route_name_input", placeholder="Ej. Reparto Lunes mañana")
+    st.text_input(T("route_name"), key="route_name_input", placeholder=T("route_name_ph"))
     
     # Campo para SELECCIONAR/CARGAR una ruta ya guardada
     st.selectbox(
-        "Rutas guardadas",
+        T("saved_routes"),
         options=[""] + sorted(ss["saved_routes"].keys()),
         key="saved_choice",
         on_change=lambda: _load_route(ss.get("saved_choice"))
@@ -286,79 +392,264 @@ def _save_load_col():
     
     # Botones principales
     c1, c2, c3 = st.columns(3)
-    with c1: st.button("Guardar/Crear", on_click=_save_current_route, use_container_width=True)
-    with c2: st.button("Guardar Cambios", on_click=_save_current_route, use_container_width=True)
-    with c3: st.button("Eliminar ruta", 
+    with c1: st.button(T("save_create"), on_click=_save_current_route, use_container_width=True)
+    with c2: st.button(T("save_changes"), on_click=_save_current_route, use_container_width=True)
+    with c3: st.button(T("delete_route"), 
                        on_click=lambda: _delete_saved_route(ss.get("saved_choice")), 
                        use_container_width=True,
                        disabled=not ss.get("saved_choice"))
                        
     # Aviso de sobrescritura (si aplica)
     if st.session_state.get("ow_pending"):
-        st.warning(f"La ruta «{ss['ow_pending']}» ya existe. ¿Sobrescribir?")
+        st.warning(T("overwrite_prompt", name=ss["ow_pending"]))
         cA, cB = st.columns(2)
         with cA:
-            st.button("✅ Sí, sobrescribir", on_click=_confirm_overwrite, args=(True,), use_container_width=True)
+            st.button(T("overwrite_yes"), on_click=_confirm_overwrite, args=(True,), use_container_width=True)
         with cB:
-            st.button("❌ Cancelar", on_click=_confirm_overwrite, args=(False,), use_container_width=True)
+            st.button(T("overwrite_no"), on_click=_confirm_overwrite, args=(False,), use_container_width=True)
 
 
 # ---------------------------
 # Generar y salidas
 # ---------------------------
+def _coords_of(metas):
+    """[(lat, lon), ...] de los metadatos resueltos, o None si falta alguna coordenada."""
+    coords = [(m.get("lat"), m.get("lon")) for m in metas]
+    if any(lat is None or lon is None for lat, lon in coords):
+        return None
+    return coords
+
+
+def _optimize_points(metas):
+    """
+    Reordena prof_points (in situ) con el optimizador local. Origen y destino quedan fijos.
+    Devuelve (metadatos reordenados, resumen before/after), o None si falta alguna coordenada.
+    """
+    ss = st.session_state
+    coords = _coords_of(metas)
+    if coords is None:
+        return None
+
+    result = optimize_coords(coords)
+    order = result["order"]
+    pts = ss["prof_points"]
+    pts[:] = [pts[i] for i in order]
+    if order != list(range(len(order))):
+        _bump_list_version()
+    summary = {"before_km": result["before_km"], "after_km": result["after_km"]}
+    return [metas[i] for i in order], summary
+
+
+def _current_route():
+    """Ruta resuelta en sesión si corresponde a la lista actual (misma list_version)."""
+    ss = st.session_state
+    route = ss.get("resolved_route")
+    if route and route["version"] == ss.get("list_version", 0):
+        return route
+    return None
+
+
+def _resolve_points(pts):
+    """
+    Metadatos de cada punto. Reutiliza los de la última ruta resuelta (aunque se haya
+    reordenado) y los guardados con la ruta cargada si no están caducados; solo
+    geocodifica el resto, incluidos los que fallaron la vez anterior.
+    """
+    ss = st.session_state
+    known = {p: m for p, m in ss.get("point_meta", {}).items() if is_fresh(m)}
+    prev = ss.get("resolved_route") or {}
+    known.update(
+        (p, m) for p, m in zip(prev.get("points", []), prev.get("metas", []))
+        if m.get("lat") is not None
+    )
+    missing = [p for p in pts if p not in known]
+    if missing:
+        known.update(zip(missing, resolve_many(missing)))
+    # Recordamos lo resuelto para poder guardarlo junto a la ruta
+    ss.setdefault("point_meta", {}).update(
+        (p, known[p]) for p in pts if known[p].get("lat") is not None
+    )
+    return [dict(known[p]) for p in pts]
+
+
+def _route_records():
+    """Paradas actuales en formato de guardado (texto + metadatos resueltos si los hay)."""
+    ss = st.session_state
+    point_meta = ss.get("point_meta", {})
+    return [stop_record(p, point_meta.get(p)) for p in ss["prof_points"]]
+
+
 def _build_and_show_outputs():
     ss = st.session_state
     
-    # Inicialización de variables
-    o_meta = None
-    d_meta = None
-
     pts = ss["prof_points"]
     if len(pts) < 2:
-        st.warning("Añade origen y destino (mínimo 2 puntos).")
+        st.warning(texts()("need_origin_dest"))
         return 
         
-    o_text = pts[0]
-    d_text = pts[-1]
-    w_texts = pts[1:-1]
-
-    o_meta = resolve_selection(o_text, None)
-    d_meta = resolve_selection(d_text, None)
-    waypoints_meta = [resolve_selection(w, None) for w in w_texts]
+    # Resolvemos todos los puntos de una vez (en paralelo, sin duplicados ni repetir los ya resueltos)
+    with track_usage() as usage:
+        metas = _resolve_points(pts)
+    # Llamadas por proveedor de esta ruta y acumuladas en la sesión (panel de administración)
+    api_calls = {name: n for name, n in usage.items() if name not in ("cache", "local")}
+    session_calls = ss.setdefault("geocode_usage", {})
+    for name, n in api_calls.items():
+        session_calls[name] = session_calls.get(name, 0) + n
 
     optimize_flag = ss.get('optimize_route', False)
-    
+    optimization = None
+    if optimize_flag:
+        optimized = _optimize_points(metas)
+        if optimized is not None:
+            # El orden ya es el óptimo: no delegamos en "optimize:true" de Google
+            metas, optimization = optimized
+            optimize_flag = False
+
+    # Las métricas (sin red) se calculan en el panel sobre estas coordenadas
+    coords = _coords_of(metas)
+    mode = ss.get("travel_mode", DEFAULT_MODE)
+
     try:
-        # === Generación de URLs ===
-        gmaps_web = build_gmaps_web_url(
-            o_meta, d_meta, 
-            waypoints_meta=waypoints_meta if waypoints_meta else None, 
-            optimize=optimize_flag
-        )
-        ss["last_gmaps_url"] = gmaps_web
+        # === Generación de URLs (un juego de enlaces + QR por tramo) ===
+        legs = build_route_legs(metas, mode=mode, optimize=optimize_flag)
+        for leg, qr in zip(legs, qr_batch([leg["gmaps"] for leg in legs])):
+            leg["qr"] = qr
         
     except Exception as e:
         # Captura errores de la API de geocodificación si la clave falla
-        st.error("❌ Error al generar la URL. Verifica las direcciones y la clave API de Google.")
+        st.error(texts()("url_error"))
         print(f"Error completo de API: {e}")
-        ss["last_gmaps_url"] = None
+        ss["resolved_route"] = None
+        return
+
+    # Todo lo necesario para pintar exportación y métricas sin volver a la red
+    ss["resolved_route"] = {
+        "version": ss.get("list_version", 0),
+        "points": list(ss["prof_points"]),
+        "metas": metas,
+        "legs": legs,
+        "coords": coords,
+        "mode": mode,
+        "optimization": optimization,
+        "optimized": optimization is not None or optimize_flag,
+        "api_calls": api_calls,
+    }
         
     # Actualiza el estado de la aplicación para que se rendericen las métricas
     st.rerun()
 
 
+# ---------------------------
+# Paneles inferiores (fragmentos: se repintan solos al tocar sus widgets)
+# ---------------------------
+@st.fragment
+def _export_panel():
+    """Enlaces y QR de la ruta resuelta; fija export_version si muestra enlaces."""
+    ss = st.session_state
+    T = texts()
+    route = _current_route()
+    st.subheader(T("export_header"))
+    if ss.get("resolved_route") and route is None:
+        st.info(T("list_changed", button=T("generate_export")))
+    legs = route["legs"] if route else []
+    ss["export_version"] = route["version"] if legs else None
+    if legs:
+        if len(legs) == 1:
+            _leg_links(legs[0])
+        else:
+            st.caption(T("route_split", legs=len(legs), max=LEG_MAX_POINTS))
+            for leg in legs:
+                with st.expander(T("leg_title", i=leg["index"] + 1, start=leg["start"], end=leg["end"]), expanded=leg["index"] == 0):
+                    _leg_links(leg)
+
+
+def _fmt_minutes(minutes):
+    minutes = int(round(minutes))
+    return f"{minutes // 60} h {minutes % 60:02d} min" if minutes >= 60 else f"{minutes} min"
+
+
+def _eta_table(route, estimate, departure):
+    """Tabla markdown parada a parada: km y minutos del tramo de llegada y hora estimada."""
+    T = texts()
+    start = datetime.datetime.combine(datetime.date.today(), departure)
+    lines = [f"| # | {T('eta_stop')} | {T('eta_leg')} | {T('eta_arrival')} |", "|---:|---|---:|---:|"]
+    leg_km, leg_min = [None] + estimate["leg_km"], [None] + estimate["leg_min"]
+    for i, (label, eta) in enumerate(zip(route["points"], estimate["eta_min"])):
+        leg = f"{leg_km[i]:.1f} km · {_fmt_minutes(leg_min[i])}" if i else "—"
+        arrival = (start + datetime.timedelta(minutes=eta)).strftime("%H:%M")
+        lines.append(f"| {i + 1} | {str(label or '').translate(_MD_SPECIAL)} | {leg} | {arrival} |")
+    return "\n".join(lines)
+
+
+@st.fragment
+def _metrics_panel():
+    ss = st.session_state
+    T = texts()
+    st.subheader(T("metrics_header"))
+    route = _current_route()
+
+    # Siempre visibles (también antes de generar): el medio se usa en los enlaces y
+    # cambiar cualquiera de los dos solo repinta este panel, la estimación es local
+    mode_labels = T["travel_modes"]
+    type_labels = dict(zip(ROUTE_TYPES, T["route_types"]))
+    col_mode, col_type = st.columns(2)
+    with col_mode:
+        mode = st.selectbox(T("travel_mode_label"), options=list(MODE_PROFILES), key="travel_mode",
+                            format_func=lambda m: mode_labels.get(m, m))
+    with col_type:
+        route_type = st.selectbox(T("route_type_label"), options=list(ROUTE_TYPES), key="route_type",
+                                  format_func=lambda r: type_labels.get(r, r))
+
+    if route:
+        col_m1, col_m2, col_m3 = st.columns(3)
+        with col_m1:
+            st.markdown(T("opt_mode"))
+            st.selectbox(T("mode"), options=[T("mode_optimized") if route["optimized"] else T("mode_original")], label_visibility="collapsed")
+        coords = route.get("coords")
+        estimate = estimate_route(coords, mode, route_type, ss.get("stop_minutes", 0)) if coords else None
+        with col_m2:
+            st.metric(
+                T("total_distance"),
+                f"{estimate['road_km']:.1f} km" if estimate else "—",
+                help=T("distance_help"),
+            )
+        with col_m3:
+            st.metric(T("est_time"), _fmt_minutes(estimate["duration_min"]) if estimate else "—",
+                      help=T("est_time_help"))
+        if mode != route.get("mode", DEFAULT_MODE):
+            st.caption(T("links_mode_differs", mode=mode_labels.get(route.get("mode", DEFAULT_MODE)),
+                         button=T("generate_export")))
+
+        if estimate:
+            with st.expander(T("eta_header")):
+                col_dep, col_stop = st.columns(2)
+                with col_dep:
+                    departure = st.time_input(T("departure"), value=datetime.time(9, 0), key="departure_time", step=300)
+                with col_stop:
+                    st.number_input(T("stop_minutes"), min_value=0, max_value=240, value=0, step=5, key="stop_minutes")
+                st.markdown(_eta_table(route, estimate, departure))
+
+        opt = route["optimization"]
+        if opt:
+            st.caption(T("opt_summary", before=opt["before_km"], after=opt["after_km"],
+                         saved=opt["before_km"] - opt["after_km"]))
+        calls = sum(route.get("api_calls", {}).values())
+        st.caption(T("api_calls", n=calls))
+
+
 # ---------------------------
 # Entrada principal
 # ---------------------------
 def mostrar_profesional():
     ss = st.session_state
+    T = texts()
     
     # Aseguramos que la bandera de optimización existe al iniciar
     if 'optimize_route' not in st.session_state:
         st.session_state['optimize_route'] = False
         
     # 1. HEADER (Título - simulación)
-    st.title("Gestor de Rutas")
+    st.title(T("prof_title"))
     
     # 2. Forzamos la recarga si el usuario cambia
     if st.session_state.get('_current_routes_user') != st.session_state.get('username'):
@@ -368,6 +659,11 @@ def mostrar_profesional():
         st.session_state["route_name_input"] = ""
         st.session_state["saved_choice"] = ""
         st.session_state["optimize_route"] = False # Resetear bandera de optimización
+        st.session_state["resolved_route"] = None
+        st.session_state["point_meta"] = {}
+
+    # En una ejecución completa el panel de exportación se repinta después de la lista
+    ss["export_version"] = None
         
     # ====================================================================
     # ESTRUCTURA PRINCIPAL (COLUMNAS IZQUIERDA/DERECHA)
@@ -384,7 +680,7 @@ def mostrar_profesional():
         
         # B. TARJETA GESTIÓN DE RUTAS (Guardar / Cargar)
         with st.container(border=True):
-            st.subheader("Gestión de Rutas")
+            st.subheader(T("routes_header"))
             _save_load_col() # Usa la función para gestión de rutas
 
     with col_der:
@@ -392,9 +688,9 @@ def mostrar_profesional():
         with st.container(border=True):
             col_list_header, col_list_clean = st.columns([8, 2])
             with col_list_header:
-                st.subheader("Direcciones de la ruta")
+                st.subheader(T("points_header"))
             with col_list_clean:
-                st.button("Limpiar", on_click=_clear_points, use_container_width=True, help="Limpiar todos los puntos")
+                st.button(T("clear"), on_click=_clear_points, use_container_width=True, help=T("clear_help"))
                 
             _list_col() # Usa la lista limpia sin subtítulos
 
@@ -403,49 +699,13 @@ def mostrar_profesional():
     # D. SECCIÓN INFERIOR: EXPORTAR Y OPTIMIZACIÓN/MÉTRICAS (Al pie de página)
     
     # Botón principal para generar la ruta que estaba abajo
-    if st.button("Generar Ruta y Exportar", type="primary", use_container_width=True):
+    if st.button(T("generate_export"), type="primary", use_container_width=True):
         _build_and_show_outputs()
         
     st.markdown("---")
         
     col_exp, col_met = st.columns([4, 8])
-    
     with col_exp:
-        st.subheader("Exportar a Mapas")
-        if ss.get("last_gmaps_url"):
-            gmaps_url = ss["last_gmaps_url"]
-            
-            # === Generación de URLs para Waze/Apple Maps ===
-            if len(ss["prof_points"]) >= 2:
-                o_meta = resolve_selection(ss["prof_points"][0], None)
-                d_meta = resolve_selection(ss["prof_points"][-1], None)
-                waze_url = build_waze_url(o_meta, d_meta)
-                apple_url = build_apple_maps_url(o_meta, d_meta)
-            else:
-                waze_url = "#"
-                apple_url = "#"
-            # ===============================================
-
-            st.link_button("Abrir en Google Maps", gmaps_url, type="primary", use_container_width=True)
-            st.link_button("Abrir en Waze", waze_url, use_container_width=True)
-            st.link_button("Copiar enlace", gmaps_url, help="Copiar URL al portapapeles", use_container_width=True)
-            
-            # === IMPLEMENTACIÓN DEL QR ===
-            st.markdown("---")
-            st.caption("Escanea el QR (Google Maps)")
-            img_buf = _qr_image_for(gmaps_url)
-            st.image(img_buf, caption="QR", width=150)
-            # =============================
-
+        _export_panel()
     with col_met:
-        st.subheader("Optimización y Métricas")
-        
-        if ss.get("last_gmaps_url"):
-            col_m1, col_m2, col_m3 = st.columns(3)
-            with col_m1:
-                st.markdown("Modo de optimización")
-                st.selectbox("Modo", options=["Ruta optimizada" if ss.get('optimize_route') else "Original"], label_visibility="collapsed")
-            with col_m2:
-                st.metric("Distancia Total", "XX km")
-            with col_m3:
-                st.metric("Tiempo Estimado", "YY min")
+        _metrics_panel()
@@ -3,19 +3,34 @@ from app_utils_core import (
     suggest_addresses, resolve_selection,
     build_gmaps_url, build_waze_url, build_apple_maps_url,
 )
+from geocoders import GeocodeError
+
+def _input_con_sugerencias(label, key):
+    """Campo de texto y, debajo, las sugerencias del índice local (sin llamadas por pulsación)."""
+    texto = st.text_input(label, placeholder="Calle / ciudad", key=key)
+    sugerencias = [s["label"] for s in suggest_addresses(texto, user=st.session_state.get("username"))]
+    if not sugerencias:
+        return texto
+    opciones = [texto] + [s for s in sugerencias if s != texto]
+    return st.selectbox("Sugerencias", opciones, key=f"{key}_sug", label_visibility="collapsed")
 
 def mostrar_profesional():
     st.header("Generar tu ruta (PRUEBAS)")
     col1, col2 = st.columns(2)
-    with col1:  origen_txt  = st.text_input("Origen", placeholder="Calle / ciudad")
-    with col2:  destino_txt = st.text_input("Destino", placeholder="Calle / ciudad")
+    with col1:  origen_txt  = _input_con_sugerencias("Origen", "origen_txt")
+    with col2:  destino_txt = _input_con_sugerencias("Destino", "destino_txt")
 
     if st.button("Generar ruta"):
         if not origen_txt or not destino_txt:
             st.warning("Introduce origen y destino.")
             return
-        origen_meta  = resolve_selection(origen_txt, None)
-        destino_meta = resolve_selection(destino_txt, None)
+        try:
+            origen_meta  = resolve_selection(origen_txt, None)
+            destino_meta = resolve_selection(destino_txt, None)
+        except GeocodeError as e:
+            # Ningún proveedor pudo responder (cuota, clave, red): no es "dirección no encontrada"
+            st.error(f"No se pudo geocodificar: {e}")
+            return
 
         gmaps_url = build_gmaps_url(origen_meta, destino_meta)
         waze_url  = build_waze_url(origen_meta, destino_meta)
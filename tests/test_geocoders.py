@@ -0,0 +1,176 @@
+# tests/test_geocoders.py
+"""
+Cadena de proveedores con proveedores falsos: hedge, circuit breaker, timeout y
+limitador de ritmo (la espera propia no debe contar como fallo del proveedor).
+
+Uso:
+    python -m pytest -q tests
+"""
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from geocode_metrics import GeocodeMetrics  # noqa: E402
+from geocoders import GeocodeError, GoogleProvider, ProviderChain, RateLimiter  # noqa: E402
+
+
+class FakeProvider:
+    """Proveedor remoto falso: tarda `delay` s y devuelve un resultado, None o una excepción."""
+
+    remote = True
+
+    def __init__(self, name, delay=0.0, result=True, error=None, timeout=1.0, limiter=None):
+        self.name = name
+        self.delay = delay
+        self.result = result
+        self.error = error
+        self.timeout = timeout
+        self.limiter = limiter
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def geocode(self, query):
+        with self._lock:
+            self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        if not self.result:
+            return None
+        return {"address": f"{query} ({self.name})", "lat": 41.0, "lon": 2.0, "source": self.name}
+
+
+def test_hedge_returns_fast_backup():
+    slow = FakeProvider("slow", delay=1.0, timeout=5.0)
+    fast = FakeProvider("fast")
+    chain = ProviderChain([slow, fast], hedge=True)
+    t0 = time.monotonic()
+    result = chain.geocode("carrer major 1")
+    assert result["source"] == "fast"
+    assert time.monotonic() - t0 < 0.9
+    assert slow.calls == 1 and fast.calls == 1
+
+
+def test_without_hedge_waits_for_first():
+    slow = FakeProvider("slow", delay=0.3)
+    fast = FakeProvider("fast")
+    chain = ProviderChain([slow, fast], hedge=False)
+    assert chain.geocode("carrer major 1")["source"] == "slow"
+    assert fast.calls == 0
+
+
+def test_breaker_opens_and_skips_provider():
+    broken = FakeProvider("broken", error=RuntimeError("503"))
+    backup = FakeProvider("backup")
+    chain = ProviderChain([broken, backup], hedge=False, breaker_threshold=3, breaker_reset=60.0)
+    for i in range(5):
+        assert chain.geocode(f"carrer {i}")["source"] == "backup"
+    assert broken.calls == 3
+    assert chain.status()["broken"]["breaker"] == "open"
+    assert chain.status()["backup"]["breaker"] == "closed"
+
+
+def test_timeout_falls_back_and_counts_failure():
+    hung = FakeProvider("hung", delay=1.0, timeout=0.2)
+    backup = FakeProvider("backup")
+    chain = ProviderChain([hung, backup], hedge=False, breaker_threshold=1)
+    t0 = time.monotonic()
+    assert chain.geocode("carrer major 1")["source"] == "backup"
+    assert time.monotonic() - t0 < 0.8
+    assert chain.status()["hung"]["breaker"] == "open"
+
+
+class FakeGoogleClient:
+    """Cliente de googlemaps falso e instantáneo."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def geocode(self, query):
+        self.calls += 1
+        return [{"geometry": {"location": {"lat": 41.0, "lng": 2.0}}, "formatted_address": query}]
+
+
+def test_rate_limit_wait_is_not_a_timeout():
+    # 16 consultas a 20/s tardan ~0,75 s, más que el timeout del proveedor: ninguna debe fallar
+    client = FakeGoogleClient()
+    google = GoogleProvider(lambda: client, RateLimiter(20), timeout=0.2)
+    chain = ProviderChain([google], hedge=False, breaker_threshold=3)
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(chain.geocode, [f"carrer {i}" for i in range(16)]))
+    assert all(r is not None for r in results)
+    assert client.calls == 16
+    assert chain.status()["google"]["breaker"] == "closed"
+
+
+def test_hedge_loser_waiting_for_its_turn_is_not_called():
+    # El respaldo espera a su limitador (ocupado) y el principal responde antes: no se llama
+    limiter = RateLimiter(1)
+    limiter.wait()
+    primary = FakeProvider("primary", delay=0.4)
+    backup = FakeProvider("backup", limiter=limiter)
+    chain = ProviderChain([primary, backup], hedge=True)
+    assert chain.geocode("carrer major 1")["source"] == "primary"
+    time.sleep(1.0)
+    assert backup.calls == 0
+
+
+def test_all_providers_failing_raises():
+    quota = FakeProvider("google", error=GeocodeError("ApiError: OVER_QUERY_LIMIT", "ApiError"))
+    down = FakeProvider("nominatim", error=GeocodeError("URLError: timed out", "URLError"))
+    chain = ProviderChain([quota, down], hedge=False)
+    with pytest.raises(GeocodeError) as info:
+        chain.geocode("carrer major 1")
+    assert "OVER_QUERY_LIMIT" in str(info.value)
+    assert info.value.kind == "URLError"
+
+
+def test_not_found_is_not_an_error():
+    quota = FakeProvider("google", error=GeocodeError("ApiError: OVER_QUERY_LIMIT", "ApiError"))
+    empty = FakeProvider("nominatim", result=False)
+    chain = ProviderChain([quota, empty], hedge=False)
+    assert chain.geocode("carrer inexistent 1") is None
+
+
+def test_open_breakers_raise():
+    broken = FakeProvider("broken", error=RuntimeError("503"))
+    chain = ProviderChain([broken], hedge=False, breaker_threshold=1, breaker_reset=60.0)
+    with pytest.raises(GeocodeError):
+        chain.geocode("carrer 1")
+    with pytest.raises(GeocodeError) as info:
+        chain.geocode("carrer 2")
+    assert info.value.kind == "CircuitOpen"
+    assert broken.calls == 1
+
+
+def test_full_pool_gives_up_waiting_for_a_turn():
+    # Pool de un hilo ocupado por una llamada colgada: la siguiente consulta no espera para siempre
+    hung = FakeProvider("hung", delay=1.5, timeout=0.2)
+    chain = ProviderChain([hung], hedge=False, max_workers=1, queue_timeout=0.3)
+    with pytest.raises(GeocodeError):
+        chain.geocode("carrer 1")
+    t0 = time.monotonic()
+    with pytest.raises(GeocodeError) as info:
+        chain.geocode("carrer 2")
+    assert time.monotonic() - t0 < 0.8
+    assert info.value.kind == "QueueTimeout"
+    assert chain.status()["hung"]["breaker"] == "closed"
+
+
+def test_late_answer_after_timeout_is_not_counted_again():
+    metrics = GeocodeMetrics()
+    hung = FakeProvider("hung", delay=0.4, timeout=0.1)
+    backup = FakeProvider("backup")
+    chain = ProviderChain([hung, backup], hedge=False, metrics=metrics)
+    assert chain.geocode("carrer major 1")["source"] == "backup"
+    time.sleep(0.5)
+    stats = metrics.snapshot()["providers"]["hung"]
+    assert stats["errors"] == {"Timeout": 1}
+    assert stats["outcomes"] == {}
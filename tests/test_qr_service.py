@@ -0,0 +1,46 @@
+# tests/test_qr_service.py
+"""
+El PNG escrito sin PIL tiene los mismos píxeles que el que genera PIL para el mismo
+símbolo QR (misma versión y corrección de errores).
+
+Uso:
+    python -m pytest -q tests
+"""
+import io
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import qr_service  # noqa: E402
+from qr_service import LONG_DATA_THRESHOLD, qr_png  # noqa: E402
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _pil_png(data, box_size, border):
+    qr = qr_service._make_qr(data, border)
+    qr.box_size = box_size
+    buf = io.BytesIO()
+    qr.make_image(fill_color="black", back_color="white").save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _pixels(png):
+    img = Image.open(io.BytesIO(png)).convert("L")
+    return img.size, img.tobytes()
+
+
+@pytest.mark.parametrize("length", [10, 120, LONG_DATA_THRESHOLD + 50, 1500])
+def test_png_matches_pil(length):
+    data = ("https://www.google.com/maps/dir/?api=1&waypoints=" + "41.98,2.82|" * 200)[:length]
+    assert _pixels(qr_png(data, box_size=4, border=2)) == _pixels(_pil_png(data, 4, 2))
+
+
+def test_long_urls_use_low_error_correction():
+    from qrcode.constants import ERROR_CORRECT_L, ERROR_CORRECT_M
+
+    assert qr_service._make_qr("x" * 50, 2).error_correction == ERROR_CORRECT_M
+    assert qr_service._make_qr("x" * (LONG_DATA_THRESHOLD + 1), 2).error_correction == ERROR_CORRECT_L
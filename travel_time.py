@@ -0,0 +1,113 @@
+# travel_time.py
+"""
+Estimación de tiempos de viaje sin red (sin Directions API).
+
+A partir de las coordenadas ya resueltas, todos los tramos a la vez con NumPy:
+  distancia en línea recta (haversine de cada par consecutivo)
+  × factor de rodeo del medio de transporte y del tipo de ruta
+  / velocidad que depende de la longitud del tramo: los tramos cortos van a
+    velocidad urbana y los largos se acercan a la de carretera
+  + tiempo fijo por tramo (arrancar, aparcar, esperar el transporte)
+  + tiempo de servicio en cada parada intermedia (opcional)
+
+Perfiles por medio (MODE_PROFILES) y modificadores por tipo de ruta (ROUTE_TYPES);
+ambos se pueden ajustar con un JSON en TRAVEL_PROFILES_PATH:
+    {"modes": {"driving": {"open_kmh": 90}}, "route_types": {"scenic": {"speed": 0.8}}}
+"""
+import json
+import os
+
+import numpy as np
+
+from distance_matrix import EARTH_RADIUS_KM
+
+# detour: km de carretera por km en línea recta; urban_kmh/open_kmh: velocidad de un tramo
+# muy corto / muy largo; ramp_km: longitud a la que se alcanza ~63 % de la diferencia;
+# leg_overhead_min: minutos fijos por tramo; road: le afecta el tipo de ruta (autopistas, peajes...)
+MODE_PROFILES = {
+    "driving":   {"detour": 1.3,  "urban_kmh": 22.0, "open_kmh": 100.0, "ramp_km": 20.0, "leg_overhead_min": 2.0, "road": True},
+    "walking":   {"detour": 1.2,  "urban_kmh": 4.5,  "open_kmh": 4.5,   "ramp_km": 1.0,  "leg_overhead_min": 0.0, "road": False},
+    "bicycling": {"detour": 1.25, "urban_kmh": 14.0, "open_kmh": 18.0,  "ramp_km": 5.0,  "leg_overhead_min": 0.5, "road": False},
+    "transit":   {"detour": 1.4,  "urban_kmh": 15.0, "open_kmh": 45.0,  "ramp_km": 15.0, "leg_overhead_min": 6.0, "road": False},
+}
+
+# En el orden de la lista "route_types" de los catálogos de i18n.
+# detour/speed multiplican el perfil; max_kmh limita la velocidad (p. ej. sin autopistas)
+ROUTE_TYPES = {
+    "fastest":        {"detour": 1.0,  "speed": 1.0},
+    "shortest":       {"detour": 0.95, "speed": 0.85},
+    "avoid_highways": {"detour": 1.05, "speed": 1.0, "max_kmh": 60.0},
+    "avoid_tolls":    {"detour": 1.03, "speed": 0.9},
+    "scenic":         {"detour": 1.2,  "speed": 0.8},
+}
+DEFAULT_MODE = "driving"
+DEFAULT_ROUTE_TYPE = "fastest"
+
+
+def _load_overrides(path):
+    """Mezcla los perfiles de un JSON sobre los de serie (claves desconocidas se añaden)."""
+    if not path:
+        return
+    try:
+        with open(path, encoding="utf-8") as fh:
+            data = json.load(fh)
+    except (OSError, ValueError) as e:
+        print(f"No se pudieron cargar los perfiles de viaje de {path}: {e}")
+        return
+    for section, target in (("modes", MODE_PROFILES), ("route_types", ROUTE_TYPES)):
+        for name, values in (data.get(section) or {}).items():
+            target[name] = {**target.get(name, {}), **values}
+
+
+_load_overrides(os.getenv("TRAVEL_PROFILES_PATH", ""))
+
+
+def leg_km(coords) -> np.ndarray:
+    """Distancia en línea recta (km) de cada tramo consecutivo: O(n), sin matriz N×N."""
+    rad = np.radians(np.asarray(coords, dtype=np.float64).reshape(-1, 2))
+    lat, lon = rad[:, 0], rad[:, 1]
+    dlat = lat[1:] - lat[:-1]
+    dlon = lon[1:] - lon[:-1]
+    h = np.sin(dlat * 0.5) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(dlon * 0.5) ** 2
+    return (2.0 * EARTH_RADIUS_KM) * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def estimate_route(coords, mode=DEFAULT_MODE, route_type=DEFAULT_ROUTE_TYPE, stop_minutes=0.0):
+    """
+    Estimación para [(lat, lon), ...] en orden de viaje. Devuelve un dict con
+    "distance_km" (línea recta), "road_km", "duration_min", y por tramo/parada
+    "leg_km", "leg_min" (n-1 valores) y "eta_min" (n valores, 0 en el origen).
+    """
+    profile = MODE_PROFILES.get(mode) or MODE_PROFILES[DEFAULT_MODE]
+    variant = (ROUTE_TYPES.get(route_type) or ROUTE_TYPES[DEFAULT_ROUTE_TYPE]) if profile.get("road") else {}
+    n = len(coords)
+    if n < 2:
+        return {"distance_km": 0.0, "road_km": 0.0, "duration_min": 0.0,
+                "leg_km": [], "leg_min": [], "eta_min": [0.0] * n}
+
+    straight = leg_km(coords)
+    road = straight * (profile["detour"] * variant.get("detour", 1.0))
+    urban, open_ = profile["urban_kmh"], profile["open_kmh"]
+    speed = urban + (open_ - urban) * -np.expm1(-road / profile["ramp_km"])
+    speed *= variant.get("speed", 1.0)
+    if "max_kmh" in variant:
+        np.minimum(speed, variant["max_kmh"], out=speed)
+    minutes = road / speed * 60.0 + profile["leg_overhead_min"]
+    # Tramos de longitud cero (paradas repetidas): sin tiempo fijo
+    minutes[road == 0] = 0.0
+
+    # Llegada a cada parada: suma de tramos + servicio en las paradas intermedias ya visitadas
+    eta = np.empty(n)
+    eta[0] = 0.0
+    np.cumsum(minutes, out=eta[1:])
+    if stop_minutes:
+        eta[1:] += np.arange(n - 1) * stop_minutes
+
+    return {
+        "distance_km": float(straight.sum()),
+        "road_km": float(road.sum()),
+        "duration_min": float(eta[-1]),
+        "leg_km": road.tolist(),
+        "leg_min": minutes.tolist(),
+        "eta_min": eta.tolist(),
+    }
@@ -0,0 +1,157 @@
+# user_store.py
+"""
+Almacén de usuarios sobre SQLite (modo WAL), con la tabla indexada por nombre de usuario.
+
+Antes los usuarios vivían en config.yaml, que se parseaba entero en cada rerun de cada
+sesión y se reescribía entero (sin bloqueo) en cada registro. Ahora:
+  - login y registro son una consulta por clave primaria: coste constante con miles de usuarios
+  - el registro es un INSERT OR IGNORE atómico: dos registros simultáneos del mismo nombre
+    (aunque sea desde procesos distintos) no se pisan, uno de los dos recibe False
+  - config.yaml sigue sirviendo para dar de alta usuarios a mano: se importa al arrancar y
+    de nuevo solo cuando cambia el fichero (mtime/tamaño), sin pisar usuarios existentes
+"""
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+USERS_DB_PATH = Path(os.getenv("USERS_DB_PATH", str(Path(".streamlit") / "users.sqlite3")))
+CONFIG_FILE = Path(os.getenv("USER_CONFIG_PATH", "config.yaml"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username      TEXT PRIMARY KEY,
+    email         TEXT NOT NULL,
+    name          TEXT NOT NULL,
+    password_hash TEXT NOT NULL,
+    created_at    REAL NOT NULL,
+    updated_at    REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS imported_configs (
+    path  TEXT PRIMARY KEY,
+    stamp TEXT NOT NULL
+);
+"""
+
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+class UserStore:
+    """Usuarios por nombre: {"email", "name", "password_hash"}."""
+
+    def __init__(self, path=USERS_DB_PATH, config_path=CONFIG_FILE):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Misma configuración que RouteStore: una conexión por proceso con lock, WAL entre procesos
+        self._db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self.config_path = Path(config_path) if config_path else None
+        self._config_stamp = None
+        self.sync_config()
+
+    def get_user(self, username):
+        """Datos del usuario, o None si no existe."""
+        self.sync_config()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT email, name, password_hash FROM users WHERE username = ?", (username,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"email": row[0], "name": row[1], "password_hash": row[2]}
+
+    def exists(self, username) -> bool:
+        return self.get_user(username) is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def register(self, username, email, name, password_hash) -> bool:
+        """Crea el usuario; False si ya existía."""
+        self.sync_config()
+        now = time.time()
+        with self._lock:
+            cur = self._db.execute(
+                "INSERT OR IGNORE INTO users (username, email, name, password_hash, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (username, email, name, password_hash, now, now),
+            )
+        return cur.rowcount > 0
+
+    def set_password_hash(self, username, password_hash) -> bool:
+        """Sustituye el hash de contraseña del usuario; False si no existe."""
+        with self._lock:
+            cur = self._db.execute(
+                "UPDATE users SET password_hash = ?, updated_at = ? WHERE username = ?",
+                (password_hash, time.time(), username),
+            )
+        return cur.rowcount > 0
+
+    def sync_config(self) -> int:
+        """
+        Importa los usuarios de config.yaml si el fichero cambió desde la última importación
+        (un os.stat en el caso normal). No pisa usuarios existentes. Devuelve cuántos añadió.
+        """
+        if self.config_path is None:
+            return 0
+        stamp = _file_stamp(self.config_path)
+        if stamp is None or stamp == self._config_stamp:
+            return 0
+        key = str(self.config_path.resolve())
+        with self._lock:
+            row = self._db.execute("SELECT stamp FROM imported_configs WHERE path = ?", (key,)).fetchone()
+        if row and row[0] == stamp:
+            self._config_stamp = stamp
+            return 0
+        import yaml  # solo si config.yaml cambió: el arranque normal no lo necesita
+        try:
+            with open(self.config_path, encoding="utf-8") as fh:
+                # Cargador en C si PyYAML está compilado con libyaml
+                config = yaml.load(fh, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader)) or {}
+            usernames = (config.get("credentials") or {}).get("usernames") or {}
+        except (OSError, yaml.YAMLError, AttributeError) as e:
+            usernames = e
+        if not isinstance(usernames, dict):
+            reason = usernames if isinstance(usernames, Exception) else "credentials.usernames no es un mapa"
+            print(f"No se pudieron importar los usuarios de {self.config_path}: {reason}")
+            # No se vuelve a intentar (ni a avisar) hasta que el fichero cambie
+            self._config_stamp = stamp
+            return 0
+        imported = 0
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                for username, data in usernames.items():
+                    if not isinstance(data, dict) or not data.get("password_hash"):
+                        continue
+                    cur = self._db.execute(
+                        "INSERT OR IGNORE INTO users (username, email, name, password_hash, created_at, updated_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (str(username), data.get("email") or "", data.get("name") or str(username),
+                         data["password_hash"], now, now),
+                    )
+                    imported += cur.rowcount
+                self._db.execute(
+                    "INSERT INTO imported_configs (path, stamp) VALUES (?, ?) "
+                    "ON CONFLICT(path) DO UPDATE SET stamp = excluded.stamp",
+                    (key, stamp),
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                # Conexión compartida: no puede quedar una transacción abierta
+                self._db.execute("ROLLBACK")
+                raise
+        self._config_stamp = stamp
+        return imported